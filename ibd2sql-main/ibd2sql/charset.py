@@ -0,0 +1,91 @@
+# 字符集 -> 解码函数, 每个字段加载表结构的时候解析一次(col['decoder']), 读数据的时候不用再判断字符集
+# 参考: https://dev.mysql.com/doc/refman/8.0/en/charset-unicode.html
+#       https://docs.python.org/3/library/codecs.html#standard-encodings
+# python没得的单字节字符集(armscii8 dec8 ...)用codecs.charmap_decode查表, 一次解码整个字符串
+import codecs
+from ibd2sql import armscii8
+from ibd2sql import dec8
+from ibd2sql import geostd8
+from ibd2sql import hp8
+from ibd2sql import keybcs2
+from ibd2sql import swe7
+from ibd2sql import tis620
+
+# mysql字符集 : python codec
+_PYTHON_CODEC = {
+	'ucs2':'utf-16-be',
+	'utf16':'utf-16-be', # utf16默认是大端字节序
+	'utf16le':'utf-16-le',
+	'utf32':'utf-32-be',
+	'big5':'big5',
+	'cp1250':'cp1250',
+	'cp1251':'cp1251',
+	'cp1256':'cp1256',
+	'cp1257':'cp1257',
+	'cp850':'cp850',
+	'cp852':'cp852',
+	'cp866':'cp866',
+	'cp932':'cp932',
+	'eucjpms':'euc_jp',
+	'ujis':'euc_jp',
+	'gb18030':'gb18030',
+	'gb2312':'gb2312',
+	'gbk':'gbk',
+	'greek':'iso8859_7',
+	'hebrew':'iso8859_8',
+	'koi8r':'koi8_r',
+	'koi8u':'koi8_u',
+	'latin1':'latin1',
+	'latin2':'iso8859_2',
+	'latin5':'iso8859_9',
+	'latin7':'iso8859_13',
+	'macce':'mac_latin2',
+	'macroman':'mac_roman',
+	'sjis':'shift_jis',
+}
+
+# mysql字符集 : {字节:utf8}
+_SINGLE_BYTE = {
+	'armscii8':armscii8.DD_ARMSCII8,
+	'dec8':dec8.DD_DEC8,
+	'geostd8':geostd8.DD_GEOSTD8,
+	'hp8':hp8.DD_HP8,
+	'keybcs2':keybcs2.DD_KEYBCS2,
+	'swe7':swe7.DD_SWE7,
+	'tis620':tis620.DD_TIS620,
+}
+
+_DECODER = {} # 字符集 : 解码函数
+
+
+def _binary(data):
+	return '0x'+data.hex()
+
+
+def _charmap(table):
+	"""
+	单字节字符集: 256个字符的解码表
+	"""
+	table = "".join([ table[x].decode() for x in range(256) ])
+	decode = codecs.charmap_decode
+	return lambda data: decode(data,'strict',table)[0]
+
+
+def charset_decoder(character_set):
+	"""
+	返回 decode(data) -> str, data是bytes. binary返回'0x...', 不认识的字符集按utf8解码. 解不了的抛异常(UnicodeDecodeError之类的)
+	"""
+	try:
+		return _DECODER[character_set]
+	except KeyError:
+		pass
+	if character_set == 'binary':
+		decode = _binary
+	elif character_set in _SINGLE_BYTE:
+		decode = _charmap(_SINGLE_BYTE[character_set])
+	elif character_set in _PYTHON_CODEC:
+		decode = lambda data,encoding=_PYTHON_CODEC[character_set]: str(data,encoding)
+	else:
+		decode = lambda data: str(data,'utf-8')
+	_DECODER[character_set] = decode
+	return decode
@@ -0,0 +1,69 @@
+# DECIMAL 解析: 按 (精度, 小数位数) 把每组数字在哪几个字节算好, 生成解析函数, 每个值只要一次int.from_bytes和几个移位
+# 存储格式(decimal2bin): 整数部分和小数部分分开, 每9位十进制数占4字节, 剩下的按 DIG2BYTES 算字节数
+#   [整数部分的零头][整数部分 4字节*n][小数部分 4字节*n][小数部分的零头]
+# 正数第1个bit置1, 负数是所有字节取反(第1个bit就是0了)
+from decimal import Decimal
+
+DIG2BYTES = (0,1,1,2,2,3,3,4,4,4)
+
+_CODEC = {} # (精度, 小数位数, as_decimal) : 解析函数
+
+
+def decimal_layout(precision,scale):
+	"""
+	返回 (总字节数, 整数部分的组, 小数部分的组), 组: (字节数, 位数) 按存储顺序
+	"""
+	intg = precision - scale
+	int_groups = ([(DIG2BYTES[intg%9],intg%9)] if intg%9 else []) + [(4,9)]*(intg//9)
+	frac_groups = [(4,9)]*(scale//9) + ([(DIG2BYTES[scale%9],scale%9)] if scale%9 else [])
+	return sum([ x[0] for x in int_groups+frac_groups ]),int_groups,frac_groups
+
+
+def compile_decimal(precision,scale,as_decimal=False):
+	"""
+	生成 decode(b,o) -> 字符串(同MySQL的显示: '-123.40', 没有小数的就没得'.') 或 decimal.Decimal(as_decimal)
+	b: 页数据(bytes/memoryview)  o: 值的offset
+	"""
+	n,int_groups,frac_groups = decimal_layout(precision,scale)
+	sign = 1 << (8*n-1)
+	def expr(groups,start):
+		"""
+		每组的值(移位+掩码) 乘上 10**后面的位数 加起来
+		"""
+		if not groups:
+			return "0"
+		terms = []
+		digits = sum([ x[1] for x in groups ])
+		for size,dig in groups:
+			start += size
+			digits -= dig
+			term = f"((v >> {8*(n-start)}) & {(1<<(8*size))-1})" if n-start else f"(v & {(1<<(8*size))-1})"
+			terms.append(f"{term}*{10**digits}" if digits else term)
+		return " + ".join(terms)
+	int_bytes = sum([ x[0] for x in int_groups ])
+	text = "{s}{" + expr(int_groups,0) + "}"
+	if scale > 0:
+		text += ".{" + expr(frac_groups,int_bytes) + f":0{scale}d}}"
+	src = "def decode(b,o):\n"
+	src += f"\tv = int.from_bytes(b[o:o+{n}],'big')\n"
+	src += f"\tif v & {sign}:\n\t\tv ^= {sign}; s = ''\n"
+	src += f"\telse:\n\t\tv ^= {(1<<(8*n))-1-sign}; s = '-'\n"
+	src += f"\treturn Decimal(f\"{text}\")\n" if as_decimal else f"\treturn f\"{text}\"\n"
+	namespace = {'Decimal':Decimal}
+	exec(compile(src,f"<decimal({precision},{scale})>",'exec'),namespace)
+	decode = namespace['decode']
+	decode.size = n
+	decode.source = src
+	return decode
+
+
+def get_decimal(extra,as_decimal=False):
+	"""
+	extra: 字段的extra (整数部分字节数, 小数部分字节数, (精度, 小数位数)), 同精度的字段共用一个解析函数
+	"""
+	key = (extra[2][0],extra[2][1],as_decimal)
+	try:
+		return _CODEC[key]
+	except KeyError:
+		_CODEC[key] = compile_decimal(extra[2][0],extra[2][1],as_decimal)
+		return _CODEC[key]
@@ -7,17 +7,50 @@ from ibd2sql.innodb_page_inode import *
 from ibd2sql.innodb_page_index import *
 from ibd2sql import lz4
 from ibd2sql import AES
+from ibd2sql.page_source import open_page_source,readahead_source,prefetch_source,throttle_source
+from ibd2sql.page_cache import page_cache
+from ibd2sql.where import compile_where
 import sys
+import os
+import copy
+from collections import OrderedDict
+
+
+# 不是压缩/加密的页里, 只有这些类型(溢出页)和非叶子页进页缓存
+_CACHE_PAGE_TYPES = tuple([ struct.pack('>H',x) for x in (10,11,12,22,23,24,25,26,27,28,29) ]) # FIL_PAGE_TYPE_BLOB ZBLOB ZBLOB2 LOB_* ZLOB_*
 
 
 class ibd2sql(object):
 	def __init__(self,*args,**kwargs):
 		self.LIMIT = -1
 		self.STATUS = False
-		self.PAGESIZE = 16384
+		self.PAGESIZE = 0 # 页大小, 0:从FSP_SPACE_FLAGS获取
+		self.PAGE_SOURCE = 'mmap' # 读页的方式: mmap/file/direct, 也可以直接给一个page source对象
+		self.READ_AHEAD = 0 # 按extent预读, 最多缓存多少个extent. 0:不预读
+		self.MAX_MBPS = 0 # 限速 MB/s, 0:不限制
+		self.MAX_IOPS = 0 # 限制IOPS, 0:不限制
+		self.THROTTLE_FILE = None # 运行中调整限速的控制文件
+		self.THROTTLE = None # throttle_source对象
+		self.OUTPUT = None # 输出SQL的文件对象, None:stdout
+		self.DEMUX_FILES = 256 # --demux 最多同时打开多少个输出文件
+		self.PREFETCH = 0 # 按level 1非叶子页上的叶子页列表提前并发读多少页. 0:不预读
+		self.PREFETCH_THREADS = 4 # 并发读的线程数
+		self.CACHE_SIZE = 0 # 页缓存(解压/解密之后的页, 非叶子页, 溢出页)大小, 字节. 0:不缓存
+		self.PAGE_CACHE = None # page_cache对象, 可以多个ibd2sql共用
+		self.DECODER = None # TableDecoder对象, 第一次解析数据页的时候初始化
+		self._DECODER_KEY = None # 初始化DECODER时的(表, 字段, 条件, 时区, DELETE, WHERE2, WHERE3, STRING_CACHE, DEBUG级别), 变了就重新初始化
+		self._FORMATTER = None # (表, SET, 字段, 每个输出字段的格式化函数, DECODER) _tosql用的
+		self.COLUMNS = None # 只要这些字段(字段名列表), 其它字段不解析. None:所有字段
+		self._OUTPUT_COLUMNS = () # 要输出的字段(字段序号), _init_sql_prefix的时候按COLUMNS算好
+		self._WHERE = None # (表, WHERE1, 编译好的条件)
+		self.TIME_ZONE = None # timestamp按哪个时区显示(--time-zone), None:SYSTEM(本地时区)
+		self.STRING_CACHE = 1024 # 每个char/varchar字段缓存多少个值(--string-cache), 前几页命中率高才启用. 0:不缓存
+		self.SCAN_ORDER = 'leaf' # leaf:沿着叶子页链表读  physical:按文件顺序读  physical-sorted:按文件顺序读, 按链表顺序输出
+		self.SORT_PAGES = 4096 # physical-sorted最多暂存多少页(还没轮到输出的), 满了就直接按链表读
 		#先初始化一堆信息.
 		self.DEBUG = False
 		self.DEBUG_FD = sys.stdout
+		self.DEBUG_LEVEL = TRACE_RECORD # DEBUG的详细程度 1(TRACE_PAGE):每页 2(TRACE_RECORD):每条记录 3(TRACE_FIELD):每个字段
 		self.FILENAME = ''
 		self.DELETE = False
 		self.FORCE = False
@@ -25,7 +58,7 @@ class ibd2sql(object):
 		self.MULTIVALUE = False
 		self.COMPLETE_SQL = False
 		self.REPLACE = False
-		self.WHERE1 = ''
+		self.WHERE1 = '' # 字段上的条件(--where), 比如 "tenant_id = 42 AND name LIKE 'abc%'"
 		self.WHERE2 = (0,2**48)
 		self.WHERE3 = (0,2**56)
 		self.PAGE_ID = 0
@@ -64,17 +97,23 @@ class ibd2sql(object):
 		self.table.table_name = name
 		return self._init_table_name()
 
-	def read(self):
+	def read(self,pageno=None):
 		"""
-		RETURN PAGE RAW DATA
+		RETURN PAGE RAW DATA (解压/解密之后的)
+		pageno: 默认self.PAGE_ID. 传pageno的时候ibd2sql对象本身就能当page source用(first_blob/溢出页)
 		"""
-		self.debug(f"ibd2sql.read PAGE: {self.PAGE_ID} ")
-		self.f.seek(self.PAGESIZE*self.PAGE_ID,0)
+		pageno = self.PAGE_ID if pageno is None else pageno
+		if self.DEBUG:
+			self.debug(f"ibd2sql.read PAGE: {pageno} ")
+		if self.PAGE_CACHE is not None:
+			data = self.PAGE_CACHE.get((self.FILENAME,pageno))
+			if data is not None:
+				return data
 		#self.PAGE_ID += 1
-		#return self.f.read(self.PAGESIZE)
 		# FOR COMPRESS PAGE
-		data = self.f.read(self.PAGESIZE)
+		data = self.f.read(pageno) # mmap的话是memoryview
 		if data[24:26] == b'\x00\x0e': # 14: 压缩页, 先解压
+			data = bytes(data)
 			FIL_PAGE_VERSION,FIL_PAGE_ALGORITHM_V1,FIL_PAGE_ORIGINAL_TYPE_V1,FIL_PAGE_ORIGINAL_SIZE_V1,FIL_PAGE_COMPRESS_SIZE_V1 = struct.unpack('>BBHHH',data[26:34])
 			if FIL_PAGE_ALGORITHM_V1 == 1:
 				data = data[:24] + struct.pack('>H',FIL_PAGE_ORIGINAL_TYPE_V1) + b'\x00'*8 + data[34:38] + zlib.decompress(data[38:38+FIL_PAGE_COMPRESS_SIZE_V1])
@@ -83,12 +122,47 @@ class ibd2sql(object):
 			else:
 				pass
 		elif data[24:26] == b'\x00\x0f': # 15: 加密页
+			data = bytes(data)
 			FIL_PAGE_VERSION,FIL_PAGE_ALGORITHM_V1,FIL_PAGE_ORIGINAL_TYPE_V1,FIL_PAGE_ORIGINAL_SIZE_V1,FIL_PAGE_COMPRESS_SIZE_V1 = struct.unpack('>BBHHH',data[26:34])
 			data = data[:24] + struct.pack('>H',FIL_PAGE_ORIGINAL_TYPE_V1) + b'\x00'*8 + data[34:38] + AES.aes_cbc256_decrypt(self.KEY,data[38:-10],self.IV) + AES.aes_cbc256_decrypt(self.KEY,data[-32:],self.IV)[-10:]
+		elif data[24:26] not in _CACHE_PAGE_TYPES and not (data[24:26] == b'E\xbf' and data[64:66] != b'\x00\x00'):
+			return data # 普通的叶子页不缓存(顺序读的, 缓存了也用不上, 还会把非叶子页/溢出页挤出去), 也不算未命中
+		if self.PAGE_CACHE is not None: # 缓存解压/解密之后的页, 和非叶子页/溢出页
+			self.PAGE_CACHE.put((self.FILENAME,pageno),bytes(data))
 		return data
 
+	def _columns(self):
+		"""
+		要输出的字段(字段序号, 按输出顺序). COLUMNS为None时是所有字段(去掉隐藏/虚拟/生成列和删除的字段)
+		COLUMNS里有表里没得的字段名就报ValueError
+		"""
+		columns = output_columns(self.table)
+		if self.COLUMNS is None:
+			return columns
+		names = { self.table.column[colno]['name'].lower():colno for colno in columns }
+		rdata = []
+		for name in self.COLUMNS:
+			if name.lower() not in names:
+				raise ValueError(f"column `{name}` not in {self.table.get_name()}")
+			rdata.append(names[name.lower()])
+		return tuple(rdata)
+
+	def _where(self):
+		"""
+		WHERE1 编译好的条件(where.compile_where), 没得条件返回None. 条件有问题(语法/字段)报ValueError
+		"""
+		if not self.WHERE1:
+			return None
+		if self._WHERE is None or self._WHERE[0] is not self.table or self._WHERE[1] != self.WHERE1:
+			self._WHERE = (self.table,self.WHERE1,compile_where(self.WHERE1,self.table))
+		return self._WHERE[2]
+
 	def _init_sql_prefix(self):
 		#self.table.remove_virtual_column() #把虚拟字段干掉
+		self._OUTPUT_COLUMNS = self._columns()
+		if self.COLUMNS is not None: # 只要部分字段的时候必须带字段名
+			self.SQL_PREFIX = f"{'REPLACE' if self.REPLACE else 'INSERT'} INTO {self.tablename}(" + ",".join([ f"`{self.table.column[x]['name']}`" for x in self._OUTPUT_COLUMNS ]) + ") VALUES "
+			return
 		#self.SQL_PREFIX = f"{ 'REPLACE' if self.REPLACE else 'INSERT'} INTO {self.tablename}{'(`'+'`,`'.join([ self.table.column[x]['name'] for x in self.table.column ]) + '`)' if self.COMPLETE_SQL else ''} VALUES "
 		SQL_PREFIX = f"{'REPLACE' if self.REPLACE else 'INSERT'} INTO {self.tablename}("
 		for x in self.table.column:
@@ -113,7 +187,21 @@ class ibd2sql(object):
 		self.debug(f"FILTER: \n\t{self.WHERE1}    \n\t{self.WHERE2[0]} < TRX < {self.WHERE2[1]}    \n\t{self.WHERE3[0]} < ROLLPTR < {self.WHERE3[1]}")
 		self.STATUS = True
 		self.debug(f"OPEN IBD FILE:",self.FILENAME)
-		self.f = open(self.FILENAME,'rb')
+		if isinstance(self.PAGE_SOURCE,str):
+			if self.PAGESIZE <= 0:
+				self.PAGESIZE = read_page_size(self.FILENAME)
+			self.f = open_page_source(self.FILENAME,self.PAGESIZE,self.PAGE_SOURCE)
+		else: # 已经打开的page source对象(比如xfs_recovery直接读块设备上被drop的表)
+			self.f = self.PAGE_SOURCE
+			self.PAGESIZE = self.f.PAGESIZE
+		self.debug(f"PAGE SIZE:",self.PAGESIZE)
+		if self.MAX_MBPS > 0 or self.MAX_IOPS > 0 or self.THROTTLE_FILE:
+			self.f = self.THROTTLE = throttle_source(self.f,self.MAX_MBPS,self.MAX_IOPS,self.THROTTLE_FILE)
+		if self.READ_AHEAD > 0:
+			self.f = readahead_source(self.f,self.READ_AHEAD)
+		self.debug(f"PAGE SOURCE:",self.f.name)
+		if self.PAGE_CACHE is None and self.CACHE_SIZE > 0:
+			self.PAGE_CACHE = page_cache(self.CACHE_SIZE)
 		self.PAGE_ID = 0
 
 		#first page
@@ -136,7 +224,7 @@ class ibd2sql(object):
 		else:
 			self.debug('ANALYZE SDI PAGE')
 			self.PAGE_ID = sdino
-			self.sdi = sdi(self.read(),debug=self.debug,filename=self.FILENAME) #sdi页
+			self.sdi = sdi(self.read(),debug=self.debug,filename=self.FILENAME,f=self) #sdi页
 			if not self.sdi:
 				self.debug("ANALYZE SDI PAGE FAILED (maybe page is not 17853), will exit 2")
 				sys.exit(2)
@@ -183,7 +271,7 @@ class ibd2sql(object):
 		while self.PAGE_ID < 4294967295 and self.PAGE_ID > 2:
 			_n += 1
 			self.debug(f'COUNT: {_n} FIND LEAF PAGE, CURRENT PAGE ID:',self.PAGE_ID)
-			aa = find_leafpage(self.read(),table=self.table, idx=self.table.cluster_index_id, debug=self.debug)
+			aa = find_leafpage(self.read(),table=self.table, idx=self.table.cluster_index_id, debug=self.debug,pagesize=self.PAGESIZE,trace=self.DEBUG_LEVEL if self.DEBUG else TRACE_OFF)
 			aa.pageno = self.PAGE_ID
 			IS_LEAF_PAGE,PAGE_ID = aa.find()
 			if IS_LEAF_PAGE:
@@ -207,6 +295,266 @@ class ibd2sql(object):
 			aa = page(self.read())
 			self.PAGE_ID = aa.FIL_PAGE_NEXT
 
+	def _index(self,data,pageno):
+		"""
+		返回解析一页用的page_cursor. 表相关的(字段, 过滤条件, 解析函数)都在 TableDecoder 上, 整个表只初始化一次
+		"""
+		where = self._where()
+		trace = self.DEBUG_LEVEL if self.DEBUG else TRACE_OFF
+		key = (self.table,self._OUTPUT_COLUMNS,where,self.TIME_ZONE,bool(self.DELETE),tuple(self.WHERE2),tuple(self.WHERE3),self.STRING_CACHE,trace) # 这些改了就要重新初始化(过滤条件是编译进解析函数里的)
+		if self.DECODER is None or self._DECODER_KEY != key:
+			self.DECODER = TableDecoder(self.table,self.table.cluster_index_id,f=self,debug=self.debug,pagesize=self.PAGESIZE,trace=trace,columns=self._OUTPUT_COLUMNS)
+			self._DECODER_KEY = key
+			self.DECODER.DELETED = True if self.DELETE else False
+			self.debug("SET FILTER",self.WHERE1,self.WHERE2,self.WHERE3)
+			self.DECODER.where = where
+			self.DECODER.TIME_ZONE = self.TIME_ZONE
+			self.DECODER.STRING_CACHE = self.STRING_CACHE
+			self.DECODER.mintrx = self.WHERE2[0]
+			self.DECODER.maxtrx = self.WHERE2[1]
+			self.DECODER.minrollptr = self.WHERE3[0]
+			self.DECODER.maxrollptr = self.WHERE3[1]
+		return self.DECODER.cursor(data,pageno)
+
+	def _print_page(self,aa):
+		"""
+		把一页的数据拼成SQL并打印, 到LIMIT了就返回False (不会再往下解析)
+		记录解析出错(坏页): FORCE的时候跳过这页(已经输出的行就算了), 不然就停止, 同样返回False
+		"""
+		if self.LIMIT == 0:
+			return False
+		sql = self.SQL_PREFIX
+		try:
+			if self.MULTIVALUE:
+				values = []
+				for x in aa.read_row():
+					values.append(self._tosql(x.row))
+					self.LIMIT -= 1
+					if self.LIMIT == 0:
+						break
+				if values:
+					print(sql + ','.join(values) + ';',file=self.OUTPUT)
+			else:
+				for x in aa.read_row():
+					print(f"{sql}{self._tosql(x.row)};",file=self.OUTPUT)
+					self.LIMIT -= 1
+					if self.LIMIT == 0:
+						break
+		except OSError: # 输出的问题(比如管道关了), 不是页的问题
+			raise
+		except Exception as e:
+			self.debug(f"PAGE {getattr(aa,'pageno',None)} READ ROW FAILED: {e}")
+			if not self.FORCE:
+				return False
+		return self.LIMIT != 0
+
+	def _root_page(self):
+		"""
+		主键索引的根页
+		"""
+		return int(self.table.index[self.table.cluster_index_id]['options']['root']) if self.table.cluster_index_id else self.first_no_leaf_page
+
+	def _leaf_pages(self,pause=False):
+		"""
+		返回主键索引所有叶子页的页号(按主键顺序)
+		从根页沿着第一个node pointer走到level 1, 再沿着level 1的链表把每页上的node pointer(子页号)列出来
+		pause: 每读完一个level 1页就给一个None (prefetch_source这次就不往下要了)
+		"""
+		pageno = self._root_page()
+		data = self.read(pageno)
+		while struct.unpack('>H',data[64:66])[0] > 1:
+			aa = find_leafpage(data,table=self.table, idx=self.table.cluster_index_id, debug=self.debug,pagesize=self.PAGESIZE,trace=self.DEBUG_LEVEL if self.DEBUG else TRACE_OFF)
+			aa.pageno = pageno
+			_,pageno = aa.find()
+			if pageno < 3 or pageno >= 4294967295:
+				return None
+			data = self.read(pageno)
+		if struct.unpack('>H',data[64:66])[0] == 0: # 只有一个页
+			yield pageno
+			return None
+		while pageno > 2 and pageno < 4294967295:
+			data = self.read(pageno)
+			aa = find_leafpage(data,table=self.table, idx=self.table.cluster_index_id, debug=self.debug,pagesize=self.PAGESIZE,trace=self.DEBUG_LEVEL if self.DEBUG else TRACE_OFF)
+			aa.pageno = pageno
+			for x in aa.find_all():
+				yield x
+			if pause:
+				yield None
+			pageno = struct.unpack('>L',data[12:16])[0] # FIL_PAGE_NEXT
+
+	def _prefetch_pages(self,start):
+		"""
+		预读的页号: start, 然后是level 1上start后面的叶子页
+		找start的时候每个level 1页交一次None, 不会在一次read里把整个level 1链表读完(--page-start的页不在列表里也一样)
+		"""
+		yield start
+		pages = self._leaf_pages(pause=True)
+		for x in pages:
+			if x == start:
+				break
+			if x is None:
+				yield None
+		for x in pages:
+			if x is not None:
+				yield x
+
+	def _physical_leaf_pages(self,start=3,checksum=False,index_ids=None):
+		"""
+		按文件顺序遍历, 返回cluster index的叶子页(PAGE_INDEX_ID和根页一样, PAGE_LEVEL=0): (pageno,data)
+		顺序读比沿着FIL_PAGE_NEXT跳来跳去快很多
+		checksum: 校验crc32c, 不对的(坏块)就跳过 (--force)
+		index_ids: 要哪些索引的叶子页(PAGE_INDEX_ID, 8字节), 默认是当前表的主键
+		"""
+		if index_ids is None:
+			index_ids = (bytes(self.read(self._root_page())[66:74]),)
+		from ibd2sql import CRC32C
+		total_pages = self.f.page_count()
+		NEXT_PAGE_ID = start
+		while NEXT_PAGE_ID < total_pages:
+			self.PAGE_ID = NEXT_PAGE_ID
+			NEXT_PAGE_ID += 1
+			try:
+				indexdata = self.read() # 读取页的时候可能就是坏块了
+			except:
+				continue
+			if indexdata[24:26] == b'E\xbf' and indexdata[66:74] in index_ids and indexdata[64:66] == b'\x00\x00':
+				if checksum:
+					checksum_field1 = struct.unpack('>L',indexdata[:4])[0]
+					checksum_field2 = struct.unpack('>L',indexdata[-8:-4])[0]
+					c1 = CRC32C.crc32c(indexdata[4:26])
+					c2 = CRC32C.crc32c(indexdata[38:-8])
+					if checksum_field1 != checksum_field2 or checksum_field1 != (c1^c2)&(2**32-1): # 坏块就不解析了
+						continue
+				yield self.PAGE_ID,indexdata
+
+	def _leaf_chain_order(self,pages,start=None):
+		"""
+		把物理顺序的叶子页按FIL_PAGE_PREV/NEXT链表(即主键顺序)重新输出
+		还没轮到的页先放着(最多SORT_PAGES页), 等链表走到它再输出; 放满了就不等了, 直接去读链表的下一页(随机读), 顺序扫到的时候跳过
+		start: 从链表的哪一页开始(--page-start), 默认第一个叶子页. 链表上在它前面的页不输出(和leaf一样), 在扫描起点前面的页直接读
+		链表断了的(坏块/被剔除的页)按物理顺序输出, 有start的时候不输出
+		"""
+		index_id = bytes(self.read(self._root_page())[66:74])
+		pending = {}
+		ahead = set() # 直接读了的页, 顺序扫到的时候跳过
+		expect = self.first_leaf_page if start is None else start
+		begin = None # 扫描起点
+		for pageno,data in pages:
+			if begin is None:
+				begin = pageno
+			if pageno in ahead:
+				ahead.discard(pageno)
+				continue
+			if expect is None: # 链表走完了, 后面的页都不在链表上
+				if start is None:
+					yield pageno,data
+				continue
+			pending[pageno] = data
+			while expect is not None:
+				if expect in pending:
+					data = pending.pop(expect)
+				elif expect in ahead or begin <= expect <= pageno: # 环/扫过了但不是叶子页(坏块), 链表断了
+					expect = None
+					break
+				elif expect < begin or len(pending) >= self.SORT_PAGES:
+					data = self.read(expect)
+					if data[24:26] != b'E\xbf' or data[64:66] != b'\x00\x00' or data[66:74] != index_id:
+						expect = None
+						break
+					ahead.add(expect)
+				else:
+					break
+				yield expect,data
+				expect = struct.unpack('>L',data[12:16])[0] # FIL_PAGE_NEXT
+				if expect < 3 or expect >= 4294967295:
+					expect = None
+			if expect is None:
+				self.debug("PAGES NOT IN LEAF CHAIN:",len(pending))
+				if start is None:
+					for pageno in sorted(pending):
+						yield pageno,pending[pageno]
+				pending.clear()
+		self.debug("PAGES NOT IN LEAF CHAIN:",len(pending))
+		if start is None:
+			for pageno in sorted(pending):
+				yield pageno,pending[pageno]
+
+	def _sdi_tables(self):
+		"""
+		返回SDI索引上所有的表[TABLE,...] (共享表空间/通用表空间里有多张表, SDI可能不止一页)
+		"""
+		pageno = self.space_page.SDI_PAGE_NO
+		data = self.read(pageno)
+		while struct.unpack('>H',data[64:66])[0] > 0: # 非叶子页, 走第一个node pointer: type(4) + id(8) + pageno(4)
+			offset = struct.unpack('>h',data[PAGE_NEW_INFIMUM-2:PAGE_NEW_INFIMUM])[0] + PAGE_NEW_INFIMUM
+			pageno = struct.unpack('>L',data[offset+12:offset+16])[0]
+			data = self.read(pageno)
+		tables = []
+		while pageno > 2 and pageno < 4294967295:
+			data = bytes(self.read(pageno))
+			tables += sdi(data,debug=self.debug,filename=self.FILENAME,f=self,init_table=False).get_tables()
+			pageno = struct.unpack('>L',data[12:16])[0] # FIL_PAGE_NEXT
+		return tables
+
+	def demux(self,outdir,ddl=False,sql=True):
+		"""
+		多张表的表空间(通用表空间/ibdata1): 只顺序扫描一次, 按PAGE_INDEX_ID把叶子页分给对应的表解析
+		每张表输出到 outdir/库名.表名.sql, 数据是文件里的物理顺序
+		表可能比ulimit -n还多, 输出文件用到的时候才打开(追加), 最多同时打开DEMUX_FILES个, 多了就关掉最久没用的
+		返回 {表名:文件名}
+		"""
+		os.makedirs(outdir,exist_ok=True)
+		tables = {} # PAGE_INDEX_ID : ibd2sql对象(浅拷贝, 共用page source和页缓存)
+		files = {} # PAGE_INDEX_ID : 文件名
+		rdata = {}
+		for table in self._sdi_tables():
+			name = table.get_name()
+			if table.cluster_index_id is None:
+				sys.stderr.write(f"{name} has no primary key, skip it\n")
+				continue
+			if table.row_format not in ['DYNAMIC', 'COMPACT']:
+				sys.stderr.write(f"{name} Not support row format. {table.row_format}, skip it\n")
+				continue
+			t = copy.copy(self)
+			t.table = table
+			t._init_table_name()
+			filename = os.path.join(outdir,f"{table.schema}.{table.table_name}.sql")
+			with open(filename,'w') as f: # 先建好(没数据的表也有文件)
+				if ddl:
+					f.write(t.get_ddl()+'\n')
+			t.OUTPUT = None
+			index_id = struct.pack('>Q',int(table.index[table.cluster_index_id]['options']['id']))
+			tables[index_id] = t
+			files[index_id] = filename
+			rdata[name] = filename
+			self.debug("DEMUX TABLE:",name,"INDEX ID:",table.index[table.cluster_index_id]['options']['id'],"->",filename)
+		if not sql:
+			return rdata
+		opened = OrderedDict() # PAGE_INDEX_ID : ibd2sql对象(OUTPUT是打开的), LRU
+		try:
+			alive = set(tables)
+			for pageno,data in self._physical_leaf_pages(index_ids=alive):
+				index_id = bytes(data[66:74])
+				t = tables[index_id]
+				if index_id in opened:
+					opened.move_to_end(index_id)
+				else:
+					if len(opened) >= max(1,self.DEMUX_FILES):
+						_,old = opened.popitem(last=False)
+						old.OUTPUT.close()
+						old.OUTPUT = None
+					t.OUTPUT = open(files[index_id],'a')
+					opened[index_id] = t
+				if not t._print_page(t._index(data,pageno)): # 到LIMIT了
+					alive.discard(index_id)
+					if not alive:
+						break
+		finally:
+			for t in opened.values():
+				t.OUTPUT.close()
+				t.OUTPUT = None
+		return rdata
+
 	def get_sql(self,):
 		self.PAGE_ID = self.PAGE_START if self.PAGE_START  > 2 else self.first_leaf_page
 		self.MULTIVALUE = False if self.REPLACE else self.MULTIVALUE #冲突
@@ -215,52 +563,35 @@ class ibd2sql(object):
 			self.debug("========================== FORCE IS TRUE =============================")
 			self.debug("============================= WARNING ================================")
 			# 实现强制解析功能, 即遍历整个ibd文件, 判断idxno&page type,然后强制解析.(跳过坏块)
-			rootpageno = int(self.table.index[self.table.cluster_index_id]['options']['root'])
-			self.PAGE_ID = rootpageno
-			indexpagedata = self.read()
-			B_PAGE_INDEX_ID = indexpagedata[38:38+56][28:28+8]
-			import os
-			from ibd2sql import CRC32C
-			total_pages = os.path.getsize(sys.argv[1])//16384
-			NEXT_PAGE_ID = 3
-			sql = self.SQL_PREFIX
-			while NEXT_PAGE_ID < total_pages:
-				self.PAGE_ID = NEXT_PAGE_ID
-				try:
-					indexdata = self.read() # 读取页的时候可能就是坏块了
-				except:
-					NEXT_PAGE_ID += 1
+			for pageno,indexdata in self._physical_leaf_pages(checksum=True):
+				if not self._print_page(self._index(indexdata,pageno)):
+					return None
+			return None
+		if self.SCAN_ORDER in ('physical','physical-sorted'):
+			# 按文件顺序读叶子页, 不走FIL_PAGE_NEXT
+			self.debug("ibd2sql get_sql BEGIN (SCAN ORDER:",self.SCAN_ORDER,"):",self.PAGE_MIN,self.PAGE_MAX,self.PAGE_COUNT)
+			pages = self._physical_leaf_pages(start=max(3,self.PAGE_START))
+			if self.SCAN_ORDER == 'physical-sorted':
+				pages = self._leaf_chain_order(pages,self.PAGE_START if self.PAGE_START > 2 else None)
+			for pageno,indexdata in pages:
+				if pageno <= self.PAGE_MIN or pageno > self.PAGE_MAX:
 					continue
-				NEXT_PAGE_ID += 1
-				if indexdata[24:26] == b'E\xbf' and indexdata[66:74] == B_PAGE_INDEX_ID and indexdata[64:66] == b'\x00\x00':
-					checksum_field1 = struct.unpack('>L',indexdata[:4])[0]
-					checksum_field2 = struct.unpack('>L',indexdata[-8:-4])[0]
-					c1 = CRC32C.crc32c(indexdata[4:26])
-					c2 = CRC32C.crc32c(indexdata[38:16384-8])
-					if checksum_field1 == checksum_field2 == (c1^c2)&(2**32-1): # 坏块就不解析了
-						aa = index(indexdata,table=self.table, idx=self.table.cluster_index_id, debug=self.debug,f=self.f)
-						aa.pageno = self.PAGE_ID
-						aa.DELETED = True if self.DELETE else False
-						_tdata = aa.read_row()
-						for x in _tdata:
-							_sql = f"{sql}{self._tosql(x['row'])};"
-							if self.LIMIT == 0:
-								return None
-							else:
-								print(_sql)
-								self.LIMIT -= 1
-			sys.exit(0)
+				if self.PAGE_SKIP > 0:
+					self.PAGE_SKIP -= 1
+					continue
+				self.PAGE_COUNT -= 1
+				if not self._print_page(self._index(indexdata,pageno)):
+					return None
+				if self.PAGE_COUNT == 0:
+					break
+			return None
 		self.debug("ibd2sql get_sql BEGIN:",self.PAGE_ID,self.PAGE_MIN,self.PAGE_MAX,self.PAGE_COUNT)
+		if self.PREFETCH > 0 and not isinstance(self.f,prefetch_source):
+			# 解析之前就把后面的叶子页并发读进来, 不用等解析完一页才知道下一页
+			self.f = prefetch_source(self.f,self._prefetch_pages(self.PAGE_ID),self.PREFETCH,self.PREFETCH_THREADS)
 		while self.PAGE_ID > self.PAGE_MIN and self.PAGE_ID <= self.PAGE_MAX and self.PAGE_ID < 4294967295 and self.PAGE_COUNT != 0:
 			self.debug("INIT INDEX OBJECT")
-			aa = index(self.read(),table=self.table, idx=self.table.cluster_index_id, debug=self.debug,f=self.f)
-			aa.DELETED = True if self.DELETE else False
-			aa.pageno = self.PAGE_ID
-			self.debug("SET FILTER",self.WHERE2,self.WHERE3)
-			aa.mintrx = self.WHERE2[0]
-			aa.maxtrx = self.WHERE2[1]
-			aa.minrollptr = self.WHERE3[0]
-			aa.maxrollptr = self.WHERE3[1]
+			aa = self._index(self.read(),self.PAGE_ID)
 			self.PAGE_ID = aa.FIL_PAGE_NEXT
 
 			if self.PAGE_SKIP > 0:
@@ -269,39 +600,8 @@ class ibd2sql(object):
 				continue
 			self.PAGE_COUNT -= 1
 
-			sql = self.SQL_PREFIX
-			if self.MULTIVALUE:
-				try:
-					_tdata = aa.read_row()
-				except Exception as e:
-					if self.FORCE:
-						continue
-					else:
-						self.debug(e)
-						break
-				for x in _tdata:
-					if self.LIMIT == 0:
-						return None
-					self.LIMIT -= 1
-					sql += self._tosql(x['row']) + ','
-				sql = (sql[:-1] + ';')
-				print(sql)
-				
-			else:
-				try:
-					_tdata = aa.read_row()
-				except Exception as e:
-					if self.FORCE:
-						continue
-					else:
-						self.debug(e)
-						break
-				for x in _tdata:
-					if self.LIMIT == 0:
-						return None
-					self.LIMIT -= 1
-					_sql = f"{sql}{self._tosql(x['row'])};"
-					print(_sql)
+			if not self._print_page(aa):
+				return None
 			if self.PAGE_COUNT == 0:
 				break
 			
@@ -356,42 +656,66 @@ class ibd2sql(object):
 	def get_ddl(self):
 		return self.table.get_ddl()
 
+	def _sql_formatter(self):
+		"""
+		每个输出字段一个格式化函数(主要是引号处理), 按表缓存, 不用每个值都判断一遍字段类型
+		"""
+		if self._FORMATTER is not None and self._FORMATTER[0] is self.table and self._FORMATTER[1] == self.SET and self._FORMATTER[2] == self._OUTPUT_COLUMNS and self._FORMATTER[4] is self.DECODER:
+			return self._FORMATTER[3]
+		strings = self.DECODER.string_caches() if self.DECODER is not None else {}
+		fmt = []
+		for colno in self._OUTPUT_COLUMNS:
+			col = self.table.column[colno]
+			if col['type'].startswith('varbinary(') or col['type'] in ['tinyblob','blob','mediumblob','longblob']:
+				fmt.append(str)
+			elif col['ct'] in ['tinyint','smallint','int','float','double','bigint','mediumint','year','decimal','vector'] :
+				fmt.append(str)
+			elif (not self.SET) and (col['ct'] in ['enum','set']):
+				fmt.append(str)
+			elif col['ct'] == 'geom':
+				extra_srsid = f"{col['srs_id']:08x}" if col['srs_id'] == 0 else ''
+				fmt.append(lambda data,extra_srsid=extra_srsid: f"0x{extra_srsid}{hex(data)[2:]}")
+			elif col['ct'] == 'binary':
+				fmt.append(hex) #转为16进制, 好看点,但没必要, 就int吧
+			elif colno in strings:
+				fmt.append(strings[colno].literal) #解码的时候缓存了repr
+			else:
+				fmt.append(repr)
+		self._FORMATTER = (self.table,self.SET,self._OUTPUT_COLUMNS,tuple(fmt),self.DECODER)
+		return self._FORMATTER[3]
+
 	def _tosql(self,row):
 		"""
 		把 row 转为SQL, 不含INSERT INTO ;等  主要是数据类型引号处理
+		row: 按_OUTPUT_COLUMNS顺序的tuple (compact_row.row), 也可以是{字段序号:值}
 		"""
-		sql = '('
-		for colno in self.table.column:
-			if 'hidden' in self.table.column[colno] and self.table.column[colno]['hidden'] > 1:
-				continue
-			if self.table.column[colno]['generation_expression'] != "":
-				continue
-			if self.table.column[colno]['is_virtual']:
-				continue
-			if self.table.column[colno]['version_dropped'] > 0:
-				continue
-			data = row[colno]
-			if data is None:
-				sql  = f"{sql}NULL, "
-			elif self.table.column[colno]['type'].startswith('varbinary(') or self.table.column[colno]['type'] in ['tinyblob','blob','mediumblob','longblob']:
-				sql  = f"{sql}{data}, "
-			elif self.table.column[colno]['ct'] in ['tinyint','smallint','int','float','double','bigint','mediumint','year','decimal','vector'] :
-				sql  = f"{sql}{data}, "
-			elif (not self.SET) and (self.table.column[colno]['ct'] in ['enum','set']):
-				sql  = f"{sql}{data}, "
-			elif self.table.column[colno]['ct'] == 'geom':
-				extra_srsid = f"{self.table.column[colno]['srs_id']:08x}" if self.table.column[colno]['srs_id'] == 0 else ''
-				sql = f"{sql}0x{extra_srsid}{hex(data)[2:]}, "
-			elif self.table.column[colno]['ct'] == 'binary':
-				sql = f"{sql}{hex(data)}, " #转为16进制, 好看点,但没必要, 就int吧
-			else:
-				sql += repr(data) + ", "
-	
-		return sql[:-2] + ")"
+		if isinstance(row,dict):
+			row = tuple([ row[colno] for colno in self._OUTPUT_COLUMNS ])
+		return "(" + ", ".join([ "NULL" if data is None else f(data) for f,data in zip(self._sql_formatter(),row) ]) + ")"
 
 	def _get_first_page(self,):
 		pass
 
+	def stats(self):
+		"""
+		运行统计信息(预读命中率之类的), dict
+		"""
+		rdata = {}
+		try:
+			rdata.update(self.f.stats())
+		except:
+			pass
+		if self.PAGE_CACHE is not None:
+			rdata.update(self.PAGE_CACHE.stats())
+		if self.DECODER is not None:
+			for colno,cache in self.DECODER.string_caches().items():
+				rdata[f"string_cache `{cache.name}`"] = cache.stats()
+		return rdata
+
+	def print_stats(self,fd=sys.stderr):
+		for k,v in self.stats().items():
+			fd.write(f"[STATS] {k}: {v}\n")
+
 	def close(self):
 		try:
 			self.f.close()
@@ -1,6 +1,8 @@
 import struct
 import time
 from .page_type import *
+from .decimal_codec import get_decimal
+from .temporal_codec import get_temporal
 
 PAGE_SIZE = 16384
 FIL_PAGE_DATA_END = 8
@@ -20,6 +22,7 @@ REC_INFO_DELETED_FLAG = 0x20
 REC_N_OWNED_MASK = 0xF
 REC_HEAP_NO_MASK = 0xFFF8
 REC_NEXT_MASK = 0xFFFF
+REC_2BYTE_EXTERN_MASK = 0x4000 # 变长字段长度的第2高位: 数据在溢出页上
 
 #REC_STATUS_ORDINARY 0
 #REC_STATUS_NODE_PTR 1
@@ -32,34 +35,10 @@ DATA_ROLL_PTR_LEN = 7
 
 REC_N_FIELDS_ONE_BYTE_MAX = 0x7F
 
-class decimal_buff(object):
-	def __init__(self,bdata,forward=False):
-		self.bdata = bdata
-		self.max_size = len(bdata)
-		self.forward = forward
-		self.offset = 0
-		self.count = 0
-		
-	def read(self,):
-		#n = 0
-		self.count += 1
-		if self.max_size - self.offset >= 4:
-			n = 4
-		#elif self.max_size - self.offset >= 2:
-		#	n = 2
-		#elif self.max_size - self.offset > 0:
-		#	n = 1
-		else:
-			n = self.max_size - self.offset
-		if self.forward:
-			data = self.bdata[self.offset:self.offset+n]
-		else:
-			if self.offset == 0:
-				data = self.bdata[-self.offset-n:]
-			else:
-				data = self.bdata[-self.offset-n:-self.offset]
-		self.offset += n
-		return data,self.offset == self.max_size
+# 1,2,4,8字节的大端整数直接在页数据上unpack_from, 不用先切片(复制)出来
+_UNPACK_UINT = { n:struct.Struct(fmt).unpack_from for n,fmt in ((1,'>B'),(2,'>H'),(4,'>L'),(8,'>Q')) }
+_UNPACK_FLOAT = struct.Struct('f').unpack_from
+_UNPACK_DOUBLE = struct.Struct('d').unpack_from
 
 def _DEBUG(*args):
 	pass
@@ -70,7 +49,7 @@ class XDES(object):
      |---> XDES_FLST_NODE  12 bytes
 XDES-|
      |---> XDES_STATE      4  bytes
-     |---> XDES_BITMAP     16 bytes
+     |---> XDES_BITMAP     16 bytes (extent的页数*2bit, 4K/8K的页更大)
 	"""
 	def __init__(self,bdata):
 		self.XDES_ID = struct.unpack('>Q',bdata[:8])[0]
@@ -173,11 +152,13 @@ INNODB_PAGE(16K)-|---> PAGE_DATA
 	def __init__(self,*args,**kwargs):
 		self.bdata = args[0]
 		bdata = self.bdata
+		self.view = memoryview(bdata) #读字段都是在这上面按offset读的, 只有要返回bytes/字符串的时候才复制
 		self.DEBUG = kwargs['debug'] if 'debug' in kwargs else _DEBUG
 		self.page_name = 'innodb page'
 		self.FIL_PAGE_SPACE_OR_CHKSUM, self.FIL_PAGE_OFFSET, self.FIL_PAGE_PREV, self.FIL_PAGE_NEXT, self.FIL_PAGE_LSN, self.FIL_PAGE_TYPE, self.FIL_PAGE_FILE_FLUSH_LSN = struct.unpack('>4LQHQ',bdata[:34])
 		self.FIL_PAGE_SPACE_ID = struct.unpack('>L',bdata[34:38])[0]
 		self.CHECKSUM, self.FIL_PAGE_LSN = struct.unpack('>2L',bdata[-8::])
+		self.PAGESIZE = kwargs['pagesize'] if 'pagesize' in kwargs else len(bdata)
 		self.offset = 38
 
 		if self.FIL_PAGE_TYPE in (FIL_PAGE_INDEX,FIL_PAGE_SDI):
@@ -186,7 +167,12 @@ INNODB_PAGE(16K)-|---> PAGE_DATA
 
 		#保存下一个字段的偏移量相对值
 		self.next_offset = self.offset
-		self._bdata = b'' #保存read的值, 方便调试
+
+	def _next_rec(self,offset,next_record):
+		"""
+		下一条记录的位置. next_record是2字节的相对偏移量, 64K的页要按页大小取模(rec_get_next_offs)
+		"""
+		return offset + next_record if self.PAGESIZE < 65536 else (offset + next_record) % 65536
 
 	def read_innodb_int(self,n,is_unsigned):
 		"""
@@ -203,14 +189,19 @@ INNODB_PAGE(16K)-|---> PAGE_DATA
 		"""
 		读innodb的 float类型
 		"""
-		return struct.unpack('f',self.read(n))[0]
+		if n != 4:
+			return struct.unpack('f',self.read(n))[0]
+		self.offset += 4
+		return _UNPACK_FLOAT(self.bdata,self.offset-4)[0]
 
 	def read_innodb_double(self,n):
-		return struct.unpack('d',self.read(n))[0]
+		if n != 8:
+			return struct.unpack('d',self.read(n))[0]
+		self.offset += 8
+		return _UNPACK_DOUBLE(self.bdata,self.offset-8)[0]
 
 	def read_innodb_bit(self,n):
-		bdata = self.read(n)
-		return int.from_bytes(bdata,'big')
+		return self._read_uint(n)
 		#return struct.unpack()
 
 
@@ -222,73 +213,7 @@ Example:
     (5,2)  整数就是2字节,   小数是1字节
     (10,3) 整数就是4字节,  小数是2字节
 		"""
-		bdata = self.read(n)
-		signed = False if int.from_bytes(bdata[:1],'big')&128 else True
-		# issue 58  
-		if signed:
-			bdata = bytes((~b&0xff) for b in bdata)
-		_signed = signed
-		signed = False
-		#print(bdata,extra)
-		p1 = extra[0] #整数部分字节数
-		p2 = extra[1] #小数部分
-		#fh = True if struct.unpack('B',bdata[:1])[0]&127 else False
-		cc = struct.pack('B',struct.unpack('B',bdata[:1])[0]&127)+bdata[1:p1]
-		t1 = decimal_buff(cc)
-		t1data = []
-		lastbytes1=0
-		while True:
-			data,isend = t1.read()
-			if data == b'':
-				break
-			lastbytes1 = len(data)
-			_data = int.from_bytes(data,'big',signed=signed)
-			_data += 1 if signed else 0
-			t1data.append(_data)
-		t2 = decimal_buff(bdata[p1:],True)
-		t2data = []
-		while True:
-			data,isend = t2.read()
-			if data == b'':
-				break
-			_data = int.from_bytes(data,'big',signed=signed)
-			_data += 1 if signed else 0
-			# 小数部分存在填充的判断(issue 44)
-			if isend:
-				if t2.count == 1:
-					_data =  str(_data).zfill(extra[2][1])
-				else:
-					_data =  str(_data).zfill(extra[2][1]-9*t2.count)
-			else:
-				if _data < 0:
-					_data = "-" + str(_data)[1:].zfill(9)
-				else:
-					_data =  str(_data).zfill(9)
-				
-			t2data.append(_data)
-		t1data.reverse()
-		if signed and len(t1data) > 1:
-			t1data[0] = 128-t1data[0]
-		elif signed and len(t1data) == 1:
-			t1data[0] = (t1data[0] ^ (2**(8*lastbytes1-1)-1)) + 1
-		rdata = "".join([ str(x).replace('-','') for x in t1data ]) + "." + "".join([ str(x).replace('-','') for x in t2data ])
-		data = f"{'-' if _signed else ''}{rdata}"
-		return data
-
-
-		p1_bdata = bdata[:p1]
-		p2_bdata = bdata[p1:]
-		p1_data = int.from_bytes(p1_bdata,'big',signed=True)
-		p2_data = int.from_bytes(p2_bdata,'big',signed=True)
-		p1_n = (p1*8)-1
-		p2_n = (p2*8)-1
-		if p1_data < 0:
-			p1_data = p1_data + (2**(8*p1-1))
-		else:
-			p1_data = p1_data - (2**(8*p1-1)) + 1
-		if p2_data < 0:
-			p2_data = -(p2_data + 1)
-		return f"{p1_data}.{p2_data}"
+		return get_decimal(extra)(self.read(n),0)
 
 	def read_innodb_set(self,):
 		pass
@@ -302,12 +227,13 @@ Example:
 		2 bytes 直接表示64KB, 肯定不够(2**16 = 16384)
 		所以, 第一字节小于等于 128 字节时, 就1字节.  否则就第一字节超过128字节的部分 *256 再加上第二字节部分来表示总大小 就是256*256 =  65536 这方法有点秀
 		"""
-		_size = self.readreverse(1)
-		size = struct.unpack('>B',_size)[0]
+		self._offset -= 1
+		size = self.view[self._offset]
 		if maxsize <= 255:
 			return size
 		if size > REC_N_FIELDS_ONE_BYTE_MAX:
-			size = struct.unpack('>B',self.readreverse(1))[0] + (size-128)*256
+			self._offset -= 1
+			size = self.view[self._offset] + (size-128)*256
 		return size
 			
 
@@ -317,7 +243,7 @@ Example:
 		"""
 		size = self._read_innodb_varsize()
 		self.debug("\tVAR FILED VAR SIZE:",size)
-		bdata = self.read(size)
+		bdata = bytes(self.read(size))
 		rdata = ''
 		if willdecode:
 			try:
@@ -350,23 +276,9 @@ Example:
 ---------------------------------------------------------------------
 
 		"""
-		bdata = self.read(n)
-		idata = int.from_bytes(bdata[:5],'big')
-		year_month = ((idata & ((1 << 17) - 1) << 22) >> 22)
-		year = int(year_month/13)
-		month = int(year_month%13)
-		day = ((idata & ((1 << 5) - 1) << 17) >> 17)
-		hour = ((idata & ((1 << 5) - 1) << 12) >> 12)
-		minute = ((idata & ((1 << 6) - 1) << 6) >> 6)
-		second = (idata& ((1 << 6) - 1))
-		great0 = True if idata&(1<<39) else False
-		fraction = int.from_bytes(bdata[5:],'big') if len(bdata)>5 else None
-		#就不转为datetime类型了(不会涉及到计算). 就字符串吧, 好看点
-		#return f"{'' if great0 else '-'}{year}-{month}-{day} {hour}:{minute}:{second}{'' if fraction is None else '.'+str(fraction)}"
-		if fraction is None:
-			return f'{year}-{month}-{day} {hour}:{minute}:{second}' if great0 else f'-{year}-{month}-{day} {hour}:{minute}:{second}'
-		else:
-			return f'{year}-{month}-{day} {hour}:{minute}:{second}.{fraction}' if great0 else f'-{year}-{month}-{day} {hour}:{minute}:{second}.{fraction}'
+		o = self.offset
+		self.offset += n
+		return get_temporal('datetime',n)(self.bdata,o)
 
 	def read_innodb_time(self,n):
 		"""
@@ -383,17 +295,9 @@ Example:
 |  fractional seconds storage  |  each 2 digits is stored 1 byte  |
 -------------------------------------------------------------------
 		"""
-		bdata = self.read(n)
-		idata = int.from_bytes(bdata[:3],'big')
-		hour = ((idata & ((1 << 10) - 1) << 12) >> 12)
-		minute = (idata & ((1 << 6) - 1) << 6) >> 6
-		second = (idata& ((1 << 6) - 1))
-		great0 = True if idata&(1<<23) else False
-		fraction = int.from_bytes(bdata[3:],'big') if len(bdata)>3 else None
-		if fraction is None:
-			return f'{hour}:{minute}:{second}' if great0 else f'-{1024-hour}:{minute}:{second}'
-		else:
-			return f'{hour}:{minute}:{second}.{fraction}' if great0 else f'-{1024-hour}:{minute}:{second}.{fraction}'
+		o = self.offset
+		self.offset += n
+		return get_temporal('time',n)(self.bdata,o)
 
 	def read_innodb_date(self,n):
 		"""
@@ -408,26 +312,17 @@ Example:
 |      day     |     5  bit       |
 -----------------------------------
 		"""
-		bdata = self.read(n)
-		idata = int.from_bytes(bdata[:3],'big')
-		year = ((idata & ((1 << 14) - 1) << 9) >> 9)
-		month = (idata & ((1 << 4) - 1) << 5) >> 5
-		day = (idata& ((1 << 5) - 1))
-		great0 = True if idata&(1<<23) else False
-		return f'{year}-{month}-{day}' if great0 else f'-{year}-{month}-{day}'
+		o = self.offset
+		self.offset += n
+		return get_temporal('date',n)(self.bdata,o)
 
 	def read_innodb_timestamp(self,n):
 		"""
 		4 bytes + fraction
 		"""
-		bdata = self.read(n)
-		ltime = time.localtime(int.from_bytes(bdata[:4],'big'))
-		fraction = int.from_bytes(bdata[4:],'big') if len(bdata)>4 else None
-		return f'{ltime.tm_year}-{ltime.tm_mon}-{ltime.tm_mday} {ltime.tm_hour}:{ltime.tm_min}:{ltime.tm_sec}.{fraction if fraction is not None else ""}'
-		if fraction is None:
-			return f'{ltime.tm_year}-{ltime.tm_mon}-{ltime.tm_mday} {ltime.tm_hour}:{ltime.tm_min}:{ltime.tm_sec}'
-		else:
-			return f'{ltime.tm_year}-{ltime.tm_mon}-{ltime.tm_mday} {ltime.tm_hour}:{ltime.tm_min}:{ltime.tm_sec}.{fraction}'
+		o = self.offset
+		self.offset += n
+		return get_temporal('timestamp',n)(self.bdata,o)
 
 	def read_innodb_big(self):
 		"""
@@ -440,9 +335,11 @@ Example:
 
 
 	def read(self,n):
-		_tdata = self.bdata[self.offset:self.offset+n]
+		"""
+		返回bytes(复制出来的, bdata是mmap的memoryview的时候也一样), 只有真要bytes的时候才用这个, 整数之类的用_read_uint/_unpack直接在页数据上读
+		"""
+		_tdata = bytes(self.bdata[self.offset:self.offset+n])
 		self.offset += n
-		self._bdata = _tdata
 		return _tdata
 
 	def readreverse(self,n): #往前读n字节
@@ -451,25 +348,40 @@ Example:
 		return _tdata
 
 	def readvar(self,):
-		colsize = struct.unpack('>B',self.bdata[self._offset-1:self._offset])[0]
+		colsize = self.view[self._offset-1]
 		if colsize < REC_N_FIELDS_ONE_BYTE_MAX:
-			colsize = struct.unpack('<H',self.bdata[self._offset-2:self._offset])[0] - 2**15
+			colsize = struct.unpack_from('<H',self.bdata,self._offset-2)[0] - 2**15
 			self._offset -= 1
 		self._offset -= 1
 		return self.read(colsize)
 		
 
+	def _unpack(self,st):
+		"""
+		按struct.Struct在当前offset读, 返回tuple
+		"""
+		self.offset += st.size
+		return st.unpack_from(self.bdata,self.offset-st.size)
+
 	def _read(self,n,signed):
-		return int.from_bytes(self.read(n), byteorder='big', signed=signed)
+		self.offset += n
+		return int.from_bytes(self.view[self.offset-n:self.offset], byteorder='big', signed=signed)
 
 	def _readreverse_int(self,n,signed):
-		return int.from_bytes(self.readreverse(n), byteorder='big', signed=signed)
+		self._offset -= n
+		return int.from_bytes(self.view[self._offset:self._offset+n], byteorder='big', signed=signed)
 
 	def _readreverse_uint(self,n):
-		return int.from_bytes(self.readreverse(n), byteorder='big')
+		self._offset -= n
+		if n in _UNPACK_UINT:
+			return _UNPACK_UINT[n](self.bdata,self._offset)[0]
+		return int.from_bytes(self.view[self._offset:self._offset+n], byteorder='big')
 
 	def _read_uint(self,n):
-		return self._read(n,False)
+		self.offset += n
+		if n in _UNPACK_UINT:
+			return _UNPACK_UINT[n](self.bdata,self.offset-n)[0]
+		return int.from_bytes(self.view[self.offset-n:self.offset], byteorder='big')
 
 	def _read_int(self,n):
 		return self._read(n,True)
@@ -1,5 +1,6 @@
 from ibd2sql.innodb_page import *
 from ibd2sql.COLLATIONS import COLLID_TO_CHAR
+from ibd2sql.charset import charset_decoder
 import struct,json,zlib
 from ibd2sql.innodb_type import innodb_type_isvar
 import base64
@@ -28,6 +29,8 @@ class TABLE(object):
 		self.null_bitmask_count_instant = 0#可为空的字段数量
 		self.instant = False #是否有过instant online DDL
 		self.instant_list = [] #
+		self.decoder = {} #生成的解析函数(row_decoder), 按字段读取顺序缓存
+		self.decode_plan = {} #每种记录格式(row version,instant flag,字段数量)的null bitmask长度和解析函数
 
 		#可禁用一些功能, 比如外键
 		self.FOREIGN = True
@@ -169,17 +172,19 @@ SDI_PAGE-|---> INFIMUM          13 bytes
 			return None
 		self.page_name = 'SDI'
 		self.filename = kwargs['filename']
+		self.f = kwargs['f'] if 'f' in kwargs else None # page source, 没有的话就直接读文件
 
 		self.HAS_IF_NOT_EXISTS = True
 		self.table = TABLE() #初始化一个表对象
-		self._init_table()
-		self.table._set_name()
+		if kwargs.get('init_table',True): # 通用表空间的SDI页上第一条不一定是表
+			self._init_table()
+			self.table._set_name()
 
-	def _init_table(self):
+	def _init_table(self,dd=None):
 		"""
 		初始化表对象
 		"""
-		dd = self.get_dict()
+		dd = self.get_dict() if dd is None else dd
 		self.table.schema = dd['dd_object']['schema_ref']
 		self.table.table_name = dd['dd_object']['name']
 
@@ -250,6 +255,7 @@ SDI_PAGE-|---> INFIMUM          13 bytes
 				'comment':col['comment'],
 				'collation':COLLID_TO_CHAR[coll_id][1],
 				'character_set':COLLID_TO_CHAR[coll_id][0],
+				'decoder':charset_decoder(COLLID_TO_CHAR[coll_id][0]), # 解码函数(charset.py)
 				'index_type':idx_type[col['column_key']],
 				'is_nullable':col['is_nullable'],
 				'is_zerofill':col['is_zerofill'],
@@ -420,11 +426,40 @@ SDI_PAGE-|---> INFIMUM          13 bytes
 		self._init_table()
 		return self.table.get_ddl()
 
-	def get_dict(self):
+	def get_records(self):
+		"""
+		返回这页上所有SDI记录的(offset, type, id). type 1:表 2:表空间
 		"""
-		返回SDI信息(dict). (读一行数据)
+		rdata = []
+		offset = self._next_rec(PAGE_NEW_INFIMUM,struct.unpack('>h',self.bdata[PAGE_NEW_INFIMUM-2:PAGE_NEW_INFIMUM])[0])
+		while offset != PAGE_NEW_SUPREMUM and offset > PAGE_NEW_SUPREMUM and offset < self.PAGESIZE:
+			dtype,did = struct.unpack('>LQ',self.bdata[offset:offset+12])
+			rdata.append((offset,dtype,did))
+			offset = self._next_rec(offset,struct.unpack('>h',self.bdata[offset-2:offset])[0])
+		return rdata
+
+	def get_tables(self):
 		"""
-		offset = struct.unpack('>h',self.bdata[PAGE_NEW_INFIMUM-2:PAGE_NEW_INFIMUM])[0] + PAGE_NEW_INFIMUM
+		返回这页上所有的表(TABLE对象), 共享表空间/通用表空间上有多张表
+		"""
+		tables = []
+		_table = self.table
+		for offset,dtype,did in self.get_records():
+			if dtype != 1:
+				continue
+			self.table = TABLE()
+			self._init_table(self.get_dict(offset))
+			self.table._set_name()
+			tables.append(self.table)
+		self.table = _table
+		return tables
+
+	def get_dict(self,offset=None):
+		"""
+		返回SDI信息(dict). (读一行数据, 默认第一行)
+		"""
+		if offset is None:
+			offset = struct.unpack('>h',self.bdata[PAGE_NEW_INFIMUM-2:PAGE_NEW_INFIMUM])[0] + PAGE_NEW_INFIMUM
 		dtype,did = struct.unpack('>LQ',self.bdata[offset:offset+12])
 		dtrx = int.from_bytes(self.bdata[offset+12:offset+12+6],'big')
 		dundo = int.from_bytes(self.bdata[offset+12+6:offset+12+6+7],'big')
@@ -436,14 +471,22 @@ SDI_PAGE-|---> INFIMUM          13 bytes
 			if REAL_SIZE != dzip_len:
 				print('REAL_SIZE != dzip_len')
 				sys.exit(1)
-			with open(self.filename,'rb') as f:
+			if self.f is not None:
 				while True:
-					f.seek(PAGENO*16384,0)
-					data = f.read(16384)
+					data = self.f.read(PAGENO)
 					REAL_SIZE,PAGENO = struct.unpack('>LL',data[38:46])
-					unzbdata += data[46:-8]
+					unzbdata += bytes(data[46:-8])
 					if PAGENO == 4294967295:
 						break
+			else:
+				with open(self.filename,'rb') as f:
+					while True:
+						f.seek(PAGENO*len(self.bdata),0)
+						data = f.read(len(self.bdata))
+						REAL_SIZE,PAGENO = struct.unpack('>LL',data[38:46])
+						unzbdata += data[46:-8]
+						if PAGENO == 4294967295:
+							break
 			unzbdata = zlib.decompress(unzbdata)
 		else:
 			unzbdata = zlib.decompress(self.bdata[offset+33:offset+33+dzip_len])
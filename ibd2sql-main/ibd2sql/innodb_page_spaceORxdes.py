@@ -1,5 +1,35 @@
 from ibd2sql.innodb_page import *
 
+def fsp_page_size(flags):
+	"""
+	从FSP_SPACE_FLAGS获取页大小 (storage/innobase/include/fsp0types.h)
+	PAGE_SSIZE在第6-9位, 0表示默认的16K, 其它的是 512<<PAGE_SSIZE (3:4K 4:8K 5:16K 6:32K 7:64K)
+	"""
+	ssize = (flags >> 6) & 0xF
+	if ssize == 0:
+		return 16384
+	return 512 << ssize if 3 <= ssize <= 7 else 0
+
+def xdes_layout(pagesize):
+	"""
+	返回 (每个XDES页有多少个XDES, 每个XDES的大小)
+	每个XDES页描述PAGESIZE个页, 每个XDES描述一个extent, bitmap每页2bit
+	"""
+	extent = 1048576//pagesize if pagesize <= 16384 else 2097152//pagesize if pagesize <= 32768 else 4194304//pagesize
+	return pagesize//extent, 24 + (extent*2+7)//8
+
+def read_page_size(filename,default=16384):
+	"""
+	读第一页(FSP_HDR)的FSP_SPACE_FLAGS得到页大小, 读不到/不认识的就返回default
+	"""
+	try:
+		with open(filename,'rb') as f:
+			data = f.read(38+24)
+		pagesize = fsp_page_size(struct.unpack('>L',data[38+16:38+20])[0])
+		return pagesize if pagesize > 0 else default
+	except Exception:
+		return default
+
 class xdes(page):
 	"""
              |---> FIL_HEADER                    38  bytes
@@ -30,21 +60,26 @@ SPACE_HEADER-|---> FSP_FRAG_N_USED               4   bytes
 			return None
 		self.page_name = 'XDES'
 
+		self.PAGESIZE = len(self.bdata)
 		if self.FIL_PAGE_TYPE == 8:
 			self.page_name = "FSP_HDR"
 			self.FSP_SPACE_ID, self.FSP_NOT_USED, self.FSP_SIZE, self.FSP_FREE_LIMIT, self.FSP_SPACE_FLAGS, self.FSP_FRAG_N_USED = struct.unpack('>6L',self.read(24))
+			self.PAGESIZE = fsp_page_size(self.FSP_SPACE_FLAGS) or self.PAGESIZE
 			self.FSP_FREE = FLST_BASE_NODE(self.read(16))
 			self.FSP_FREE_FRAG = FLST_BASE_NODE(self.read(16))
 			self.FSP_FULL_FRAG = FLST_BASE_NODE(self.read(16))
 			self.FSP_SEG_ID = struct.unpack('>Q',self.read(8))
 			self.FSP_SEG_INODES_FULL = FLST_BASE_NODE(self.read(16))
 			self.FSP_SEG_INODES_FREE = FLST_BASE_NODE(self.read(16))
+		else: # XDES页也预留了SPACE_HEADER的位置
+			self.offset += 112
 
 
-		#XDES
+		#XDES 16K的页是256个40字节的
 		self.XDES = []
-		for x in range(256):
-			self.XDES.append(XDES(self.read(40)))
+		xdes_count,xdes_size = xdes_layout(self.PAGESIZE)
+		for x in range(xdes_count):
+			self.XDES.append(XDES(self.read(xdes_size)))
 
 		#SDI PAGE NUMBER for issue 5 https://github.com/ddcw/ibd2sql/issues/5
 		self.offset += INFO_MAX_SIZE #SDI_OFFSET
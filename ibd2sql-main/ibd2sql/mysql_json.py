@@ -1,6 +1,9 @@
 #@mysql sql/json_binary.h
 import struct
 import sys
+import base64
+from json.encoder import encode_basestring_ascii
+from ibd2sql.decimal_codec import get_decimal
 
 _ = """
                                                                - -----------------
@@ -256,6 +259,166 @@ class jsonob(object):
 
 
 
+
+# 下面是直接把二进制json转成json字符串的(不生成dict/list再json.dumps), 格式同json.dumps(ensure_ascii)
+# 在memoryview上按offset读, 不切片复制, 结果一段一段的append到out里, 最后join一次
+# 和jsonob不一样的地方(按sql/json_binary.cc): int32/uint32只有large格式才是inline的, int64/uint64/double都是offset,
+# 字符串长度是变长的(每字节7bit), custom data(0x0f) 解析decimal和时间类型, 其它的同MySQL输出 base64:typeN:...
+
+_SIZE = {0x00:False,0x01:True,0x02:False,0x03:True} # 对象/数组 : 是否large格式
+_HEADER = (struct.Struct('<HH').unpack_from,struct.Struct('<LL').unpack_from) # element count, size
+_KEY_ENTRIES = (struct.Struct('<HH').iter_unpack,struct.Struct('<LH').iter_unpack) # key offset, key length
+_VALUE_ENTRIES = (struct.Struct('<BH').iter_unpack,struct.Struct('<BL').iter_unpack) # type, offset/inline value
+_SCALAR = {
+	0x05:struct.Struct('<h').unpack_from,
+	0x06:struct.Struct('<H').unpack_from,
+	0x07:struct.Struct('<l').unpack_from,
+	0x08:struct.Struct('<L').unpack_from,
+	0x09:struct.Struct('<q').unpack_from,
+	0x0a:struct.Struct('<Q').unpack_from,
+}
+_DOUBLE = struct.Struct('<d').unpack_from
+_LITERAL = {0:'null',1:'true',2:'false'}
+
+
+def _varlen(b,offset):
+	"""
+	字符串/custom data的长度, 每字节低7bit, 最高bit是1表示后面还有. 返回 (长度, 数据的offset)
+	"""
+	size = 0
+	shift = 0
+	while True:
+		x = b[offset]
+		offset += 1
+		size |= (x & 127) << shift
+		if not x & 128:
+			return size,offset
+		shift += 7
+
+
+def _double(v):
+	"""
+	同json.dumps的float
+	"""
+	if v != v:
+		return 'NaN'
+	if v in (float('inf'),float('-inf')):
+		return 'Infinity' if v > 0 else '-Infinity'
+	return float.__repr__(v)
+
+
+def _opaque(b,offset):
+	"""
+	custom data: field_type(1) + 长度(变长) + 数据
+	"""
+	field_type = b[offset]
+	size,offset = _varlen(b,offset+1)
+	data = b[offset:offset+size]
+	if field_type == 246 and size >= 2: # decimal: 精度, 小数位数, decimal2bin
+		return get_decimal((0,0,(data[0],data[1])))(data,2)
+	if field_type in (7,10,11,12) and size == 8: # timestamp date time datetime: 8字节packed longlong
+		v = struct.unpack_from('<q',data)[0]
+		sign = '-' if v < 0 else ''
+		v = abs(v)
+		frac = v % (1<<24)
+		v >>= 24
+		if field_type == 11:
+			return f'"{sign}{(v>>12)%1024:02d}:{(v>>6)%64:02d}:{v%64:02d}.{frac:06d}"'
+		ymd = v >> 17
+		hms = v % (1<<17)
+		ym = ymd >> 5
+		date = f"{ym//13:04d}-{ym%13:02d}-{ymd%32:02d}"
+		if field_type == 10:
+			return f'"{date}"'
+		return f'"{date} {hms>>12:02d}:{(hms>>6)%64:02d}:{hms%64:02d}.{frac:06d}"'
+	return f'"base64:type{field_type}:{base64.b64encode(data).decode()}"'
+
+
+def _write_value(b,t,offset,out):
+	"""
+	offset处类型为t的值(不是inline的)
+	"""
+	if t in _SIZE:
+		_write_container(b,t,offset,out)
+	elif t == 0x0c:
+		size,offset = _varlen(b,offset)
+		out.append(encode_basestring_ascii(str(b[offset:offset+size],'utf-8')))
+	elif t == 0x0b:
+		out.append(_double(_DOUBLE(b,offset)[0]))
+	elif t in _SCALAR:
+		out.append(str(_SCALAR[t](b,offset)[0]))
+	elif t == 0x04:
+		out.append(_LITERAL.get(b[offset],'""'))
+	elif t == 0x0f:
+		out.append(_opaque(b,offset))
+	else:
+		raise ValueError(f"unknown json type {t}")
+
+
+def _write_container(b,t,offset,out):
+	"""
+	对象/数组, offset是element count的位置. 里面的offset都是相对这个位置的
+	key entry/value entry 用iter_unpack一次读完, 字符串(最常见的)直接在这里处理, 少一层调用
+	"""
+	large = _SIZE[t]
+	ss = 4 if large else 2
+	count,size = _HEADER[large](b,offset)
+	is_object = t <= 0x01
+	start = offset + 2*ss
+	if is_object:
+		keys = _KEY_ENTRIES[large](b[start:start+count*(ss+2)])
+		start += count*(ss+2)
+	values = _VALUE_ENTRIES[large](b[start:start+count*(ss+1)])
+	out.append('{' if is_object else '[')
+	for i in range(count):
+		if i:
+			out.append(', ')
+		if is_object:
+			key_offset,key_length = next(keys)
+			key_offset += offset
+			out.append(encode_basestring_ascii(str(b[key_offset:key_offset+key_length],'utf-8')))
+			out.append(': ')
+		vt,v = next(values)
+		if vt == 0x0c:
+			v += offset
+			n = b[v]
+			if n < 128:
+				v += 1
+			else:
+				n,v = _varlen(b,v)
+			out.append(encode_basestring_ascii(str(b[v:v+n],'utf-8')))
+		elif vt == 0x04:
+			out.append(_LITERAL.get(v & 0xff,'""'))
+		elif vt == 0x05:
+			v &= 0xffff
+			out.append(str(v-65536 if v & 32768 else v))
+		elif vt == 0x06:
+			out.append(str(v & 0xffff))
+		elif large and vt == 0x07:
+			out.append(str(v-4294967296 if v & 2147483648 else v))
+		elif large and vt == 0x08:
+			out.append(str(v))
+		else:
+			_write_value(b,vt,offset+v,out)
+	out.append('}' if is_object else ']')
+
+
+def json_text(bdata):
+	"""
+	json字段的数据(第1字节是类型) -> json字符串. 同 json.dumps(jsonob(bdata[1:],bdata[0]).init()), 但不生成中间的dict/list
+	bdata: bytes/memoryview(溢出页的或者页上的, 不用复制出来)
+	"""
+	if len(bdata) == 0:
+		return 'null'
+	b = bdata if isinstance(bdata,memoryview) else memoryview(bdata)
+	t = b[0]
+	if t in _SIZE and _HEADER[_SIZE[t]](b,1)[1] != len(b)-1: # 大小对不上, 同jsonob返回None
+		return 'null'
+	out = []
+	_write_value(b,t,1,out)
+	return "".join(out)
+
+
 #aa = btojson(b'\x00\x01\x00\r\x00\x0b\x00\x02\x00\x05{\x00t1')
 #aa = btojson(b'\x00\x01\x00,\x00\x0b\x00\x02\x00\x0c\r\x00t1\x1eAAAAAAAAAAAAAAAAACBBBBBBBBBBBB')
 #aa = btojson(b'\x00\x02\x00)\x00\x12\x00\x02\x00\x14\x00\x02\x00\x00\x16\x00\x0c&\x00a1a2\x01\x00\x10\x00\x0b\x00\x02\x00\x0c\r\x00b1\x02b1\x02a6')
@@ -0,0 +1,60 @@
+# write by ddcw @https://github.com/ddcw/ibd2sql
+# 页缓存: 缓存解压/解密之后的页和非叶子页/溢出页(LRU, 按字节数限制大小)
+from collections import OrderedDict
+
+
+class page_cache(object):
+	"""
+	key:   (filename, pageno)
+	value: 解压/解密之后的页/非叶子页/溢出页的数据(bytes, 不要放memoryview, 不然会把整个mmap/预读的extent都留在内存里)
+	capacity: 最多缓存多少字节, 超了就淘汰最久没用的页
+
+	可以多个ibd2sql对象共用一个(比如分区表/--sdi-table的时候)
+	"""
+	def __init__(self,capacity=64*1024*1024):
+		self.capacity = capacity
+		self.size = 0
+		self.data = OrderedDict()
+		self.hit = 0
+		self.miss = 0
+		self.evict = 0
+
+	def get(self,key):
+		"""
+		没有就返回None. 未命中是put的时候算的(读出来才知道这页该不该缓存, 不该缓存的页不算未命中)
+		"""
+		data = self.data.get(key)
+		if data is None:
+			return None
+		self.hit += 1
+		self.data.move_to_end(key)
+		return data
+
+	def put(self,key,data):
+		self.miss += 1
+		n = len(data)
+		if n > self.capacity:
+			return False
+		if key in self.data:
+			self.size -= len(self.data.pop(key))
+		self.data[key] = data
+		self.size += n
+		while self.size > self.capacity:
+			_,_data = self.data.popitem(last=False)
+			self.size -= len(_data)
+			self.evict += 1
+		return True
+
+	def clear(self):
+		self.data.clear()
+		self.size = 0
+
+	def stats(self):
+		total = self.hit + self.miss
+		return {
+			'cache_hit':self.hit,
+			'cache_miss':self.miss,
+			'cache_evict':self.evict,
+			'cache_hit_rate':f"{round(self.hit*100/total,2) if total else 0}%",
+			'cache_size':self.size,
+		}
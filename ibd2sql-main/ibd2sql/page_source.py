@@ -0,0 +1,503 @@
+# write by ddcw @https://github.com/ddcw/ibd2sql
+# 按页号读取数据页(page source). ibd2sql/index/first_blob/web控制台 都走这一层, 方便替换底层的读取方式
+import os
+import mmap
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from ibd2sql.innodb_page_spaceORxdes import xdes
+
+# storage/innobase/include/fsp0fsp.h  xdes_state_t
+XDES_FREE = 1
+XDES_FREE_FRAG = 2
+XDES_FULL_FRAG = 3
+XDES_FSEG = 4
+XDES_FSEG_FRAG = 5
+
+def extent_size(pagesize):
+	"""
+	一个extent有多少页 (FSP_EXTENT_SIZE): <=16K是1MB, 32K是2MB, 64K是4MB
+	"""
+	if pagesize <= 16384:
+		return 1048576//pagesize
+	elif pagesize <= 32768:
+		return 2097152//pagesize
+	else:
+		return 4194304//pagesize
+
+
+class page_source(object):
+	"""
+	基础实现: seek + read, 每页一次系统调用, 返回bytes
+
+	input:  filename, pagesize
+	read(pageno) -> 该页的数据 (文件末尾不足一页时返回的数据会变短)
+	"""
+	def __init__(self,filename,pagesize=16384):
+		self.filename = filename
+		self.PAGESIZE = pagesize
+		self.f = open(filename,'rb')
+		self.name = 'file'
+		self.bytes_read = 0
+		self.start_time = time.time()
+
+	def read(self,pageno):
+		self.f.seek(pageno*self.PAGESIZE,0)
+		data = self.f.read(self.PAGESIZE)
+		self.bytes_read += len(data)
+		return data
+
+	def size(self):
+		return os.fstat(self.f.fileno()).st_size
+
+	def page_count(self):
+		return self.size()//self.PAGESIZE
+
+	def pread(self,pageno):
+		"""
+		不依赖文件偏移量的读(os.pread), 多线程同时读也没问题
+		"""
+		data = os.pread(self.f.fileno(),self.PAGESIZE,pageno*self.PAGESIZE)
+		self.bytes_read += len(data)
+		return data
+
+	def read_extent(self,pageno,n):
+		"""
+		一次IO读连续的n页
+		"""
+		self.f.seek(pageno*self.PAGESIZE,0)
+		data = self.f.read(n*self.PAGESIZE)
+		self.bytes_read += len(data)
+		return data
+
+	def stats(self):
+		"""
+		运行统计信息, 子类/包装层自己加
+		"""
+		elapsed = time.time() - self.start_time
+		return {
+			'page_source':self.name,
+			'bytes_read':self.bytes_read,
+			'read_mbps':round(self.bytes_read/1024/1024/elapsed,2) if elapsed > 0 else 0,
+		}
+
+	def close(self):
+		try:
+			self.f.close()
+		except:
+			pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+
+class mmap_source(page_source):
+	"""
+	mmap实现: 整个文件映射到内存, read返回memoryview切片(零拷贝), 没有seek/read的系统调用开销
+	注意: 返回的是memoryview, 需要str的时候要先bytes()一下
+	"""
+	def __init__(self,filename,pagesize=16384):
+		super().__init__(filename,pagesize)
+		self.name = 'mmap'
+		self.mm = mmap.mmap(self.f.fileno(),0,access=mmap.ACCESS_READ)
+		self.view = memoryview(self.mm)
+
+	def read(self,pageno):
+		offset = pageno*self.PAGESIZE
+		data = self.view[offset:offset+self.PAGESIZE]
+		self.bytes_read += len(data)
+		return data
+
+	def size(self):
+		return len(self.mm)
+
+	def read_extent(self,pageno,n):
+		offset = pageno*self.PAGESIZE
+		if hasattr(self.mm,'madvise') and offset < len(self.mm): # 让内核提前把整个extent读进来
+			self.mm.madvise(mmap.MADV_WILLNEED,offset-offset%mmap.PAGESIZE,min(n*self.PAGESIZE,len(self.mm)-offset))
+		data = self.view[offset:offset+n*self.PAGESIZE]
+		self.bytes_read += len(data)
+		return data
+
+	def close(self):
+		try:
+			self.view.release()
+			self.mm.close()
+		except BufferError: # 还有切片没释放(比如index对象还拿着页数据), 交给GC吧
+			pass
+		super().close()
+
+
+class direct_source(page_source):
+	"""
+	不经过(不污染)操作系统page cache的读, 和线上的mysqld跑在同一台机器上的时候用, 避免把mysqld的热数据挤出去
+	优先用O_DIRECT(对齐的buffer), 文件系统不支持O_DIRECT(比如tmpfs)或者没有preadv的时候, 退化为普通读+posix_fadvise(DONTNEED)
+	返回bytes
+	"""
+	def __init__(self,filename,pagesize=16384):
+		super().__init__(filename,pagesize)
+		self.name = 'direct'
+		self.fd = -1
+		self.buffer = None
+		if hasattr(os,'O_DIRECT') and hasattr(os,'preadv'):
+			try:
+				self.fd = os.open(filename,os.O_RDONLY|os.O_DIRECT)
+				self.buffer = mmap.mmap(-1,self.PAGESIZE) # 匿名mmap是按内存页对齐的
+				os.preadv(self.fd,[self.buffer],0) # 有的文件系统open的时候不报错, 读的时候才报EINVAL
+			except OSError:
+				self._close_direct()
+		if self.fd < 0:
+			self.name = 'fadvise'
+
+	def _close_direct(self):
+		if self.fd >= 0:
+			os.close(self.fd)
+		self.fd = -1
+		self.buffer = None
+
+	def _read(self,offset,size):
+		if self.fd >= 0:
+			if len(self.buffer) < size:
+				self.buffer = mmap.mmap(-1,size)
+			n = os.preadv(self.fd,[memoryview(self.buffer)[:size]],offset)
+			data = self.buffer[:n] # buffer会被下次读覆盖, 要复制出来
+		else:
+			data = os.pread(self.f.fileno(),size,offset)
+			if hasattr(os,'posix_fadvise'):
+				os.posix_fadvise(self.f.fileno(),offset,size,os.POSIX_FADV_DONTNEED)
+		self.bytes_read += len(data)
+		return data
+
+	def read(self,pageno):
+		return self._read(pageno*self.PAGESIZE,self.PAGESIZE)
+
+	def pread(self,pageno):
+		# O_DIRECT的时候多个线程共用一个buffer不安全, 单独分配
+		if self.fd >= 0:
+			buffer = mmap.mmap(-1,self.PAGESIZE)
+			n = os.preadv(self.fd,[buffer],pageno*self.PAGESIZE)
+			self.bytes_read += n
+			return buffer[:n]
+		return self._read(pageno*self.PAGESIZE,self.PAGESIZE)
+
+	def read_extent(self,pageno,n):
+		return self._read(pageno*self.PAGESIZE,n*self.PAGESIZE)
+
+	def close(self):
+		self._close_direct()
+		super().close()
+
+
+class throttle_source(object):
+	"""
+	限速(令牌桶): 和线上数据库跑在同一台机器上导数据的时候, 限制读取的速度(MB/s)和IOPS
+	每次真正的IO(一页/一个extent)都要先拿到令牌, 桶的容量是1秒的量, 拿不到就sleep
+	max_mbps/max_iops: 0表示不限制
+	control_file: 运行中调整限速, 文件内容是 max_mbps=N 和/或 max_iops=N (一行一个), 最多每秒检查一次(看mtime)
+	也可以调用scale()调整(比如main.py里收到SIGUSR1/SIGUSR2的时候翻倍/减半)
+	"""
+	def __init__(self,source,max_mbps=0,max_iops=0,control_file=None):
+		self.source = source
+		self.PAGESIZE = source.PAGESIZE
+		self.filename = source.filename
+		self.name = f'{source.name}+throttle'
+		self.max_mbps = max_mbps
+		self.max_iops = max_iops
+		self.control_file = control_file
+		self.control_mtime = 0
+		self.control_check = 0
+		self.lock = threading.Lock() # prefetch的时候是多线程读
+		self.last = time.monotonic()
+		self.byte_tokens = max_mbps*1048576
+		self.io_tokens = max_iops
+		self.wait_time = 0
+		self.throttled = 0
+		self.pending = [] # scale()还没生效的倍数, 下次_wait的时候乘上去
+		self._check_control_file()
+
+	def _check_control_file(self):
+		if self.control_file is None:
+			return None
+		now = time.monotonic()
+		if now - self.control_check < 1:
+			return None
+		self.control_check = now
+		try:
+			mtime = os.stat(self.control_file).st_mtime
+			if mtime == self.control_mtime:
+				return None
+			self.control_mtime = mtime
+			with open(self.control_file,'r') as f:
+				for line in f:
+					k,_,v = line.partition('=')
+					k = k.strip().lower().replace('-','_')
+					if k in ('max_mbps','max_iops'):
+						setattr(self,k,float(v))
+		except (OSError,ValueError): # 文件不存在/写了一半, 保持原来的限速
+			pass
+
+	def scale(self,ratio):
+		"""
+		限速乘以ratio (没限制的还是不限制), 下次读的时候生效
+		信号处理函数里调用的(和_wait同一个线程), 所以这里不能拿锁, 只记下来(list.append是原子的)
+		"""
+		self.pending.append(ratio)
+
+	def _wait(self,nbytes):
+		with self.lock:
+			while self.pending:
+				ratio = self.pending.pop()
+				self.max_mbps *= ratio
+				self.max_iops *= ratio
+			self._check_control_file()
+			now = time.monotonic()
+			elapsed = now - self.last
+			self.last = now
+			wait = 0
+			if self.max_mbps > 0:
+				rate = self.max_mbps*1048576
+				self.byte_tokens = min(rate,self.byte_tokens+elapsed*rate) - nbytes
+				if self.byte_tokens < 0:
+					wait = -self.byte_tokens/rate
+			if self.max_iops > 0:
+				self.io_tokens = min(self.max_iops,self.io_tokens+elapsed*self.max_iops) - 1
+				if self.io_tokens < 0:
+					wait = max(wait,-self.io_tokens/self.max_iops)
+			if wait > 0: # 欠的令牌下次拿的时候会按时间补回来
+				self.throttled += 1
+				self.wait_time += wait
+		if wait > 0: # 放了锁再sleep, 不然别的线程/信号处理都要等
+			time.sleep(wait)
+
+	def read(self,pageno):
+		self._wait(self.PAGESIZE)
+		return self.source.read(pageno)
+
+	def read_extent(self,pageno,n):
+		self._wait(n*self.PAGESIZE)
+		return self.source.read_extent(pageno,n)
+
+	def pread(self,pageno):
+		self._wait(self.PAGESIZE)
+		return self.source.pread(pageno)
+
+	def size(self):
+		return self.source.size()
+
+	def page_count(self):
+		return self.source.page_count()
+
+	def stats(self):
+		rdata = self.source.stats()
+		rdata['throttle_max_mbps'] = self.max_mbps
+		rdata['throttle_max_iops'] = self.max_iops
+		rdata['throttle_count'] = self.throttled
+		rdata['throttle_wait_seconds'] = round(self.wait_time,3)
+		return rdata
+
+	def close(self):
+		self.source.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+
+class readahead_source(object):
+	"""
+	按extent预读: 读某页的时候, 如果它所在的extent(XDES)属于某个segment, 就一次IO读整个extent(64页)放到buffer里
+	叶子页在extent内基本是连续的, 这样沿着FIL_PAGE_NEXT走的时候大部分页都能直接从buffer取, 不用每页都去seek
+	buffer大小按extent数量限制(LRU)
+
+	input: source:  底层page source
+	       extents: 最多缓存多少个extent
+	"""
+	def __init__(self,source,extents=16):
+		self.source = source
+		self.PAGESIZE = source.PAGESIZE
+		self.filename = source.filename
+		self.name = f'{source.name}+readahead'
+		self.EXTENT_SIZE = extent_size(self.PAGESIZE)
+		self.max_extents = max(1,extents)
+		self.buffer = OrderedDict() # extent no : data
+		self.xdes_page = {} # xdes page no : [XDES,...]
+		self.hit = 0
+		self.miss = 0
+		self.extent_read = 0
+
+	def _xdes_state(self,pageno):
+		"""
+		返回这页所在extent的XDES_STATE, 每个XDES页(第0页是FSP_HDR)描述PAGESIZE个页
+		"""
+		xdes_pageno = pageno - pageno%self.PAGESIZE
+		if xdes_pageno not in self.xdes_page:
+			try:
+				self.xdes_page[xdes_pageno] = xdes(self.source.read(xdes_pageno)).XDES
+			except Exception: # 坏块/不完整的文件, 就不预读了
+				self.xdes_page[xdes_pageno] = []
+		xdes_list = self.xdes_page[xdes_pageno]
+		i = (pageno%self.PAGESIZE)//self.EXTENT_SIZE
+		return xdes_list[i].XDES_STATE if i < len(xdes_list) else 0
+
+	def read(self,pageno):
+		extentno = pageno//self.EXTENT_SIZE
+		if extentno in self.buffer:
+			self.hit += 1
+			self.buffer.move_to_end(extentno)
+		elif self._xdes_state(pageno) in (XDES_FSEG,XDES_FSEG_FRAG):
+			self.miss += 1
+			self.extent_read += 1
+			self.buffer[extentno] = self.source.read_extent(extentno*self.EXTENT_SIZE,self.EXTENT_SIZE)
+			if len(self.buffer) > self.max_extents:
+				self.buffer.popitem(last=False)
+		else: # 碎片页(FREE_FRAG/FULL_FRAG) 或者未使用的extent, 读整个extent没意义
+			self.miss += 1
+			return self.source.read(pageno)
+		offset = (pageno-extentno*self.EXTENT_SIZE)*self.PAGESIZE
+		return memoryview(self.buffer[extentno])[offset:offset+self.PAGESIZE]
+
+	def read_extent(self,pageno,n):
+		return self.source.read_extent(pageno,n)
+
+	def pread(self,pageno):
+		return self.source.pread(pageno)
+
+	def size(self):
+		return self.source.size()
+
+	def page_count(self):
+		return self.source.page_count()
+
+	def stats(self):
+		rdata = self.source.stats()
+		total = self.hit + self.miss
+		rdata['readahead_extents'] = self.extent_read
+		rdata['readahead_hit'] = self.hit
+		rdata['readahead_miss'] = self.miss
+		rdata['readahead_hit_rate'] = f"{round(self.hit*100/total,2) if total else 0}%"
+		return rdata
+
+	def close(self):
+		self.buffer.clear()
+		self.source.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+
+class prefetch_source(object):
+	"""
+	按给定的页号顺序(比如level 1非叶子页里的叶子页列表)提前用多个线程并发pread, 解析的时候直接拿结果
+	不用等解析完一页才知道下一页是哪个, 高延迟的存储(网络盘/云盘)上效果明显
+	只是预读, 读的页不在列表里(或者列表和实际链表对不上)就直接同步读, 不影响结果
+
+	input: source:  底层page source
+	       pages:   页号的迭代器(可以是generator, 边读边生成, 生成的时候读的页直接读底层source), 给None表示这次先不预读了, 下次read再接着要
+	       depth:   最多提前读多少页
+	       threads: 并发读的线程数
+	"""
+	def __init__(self,source,pages,depth=32,threads=4):
+		self.source = source
+		self.PAGESIZE = source.PAGESIZE
+		self.filename = source.filename
+		self.name = f'{source.name}+prefetch'
+		self.pages = iter(pages)
+		self.depth = max(1,depth)
+		self.executor = ThreadPoolExecutor(max_workers=max(1,threads))
+		self.future = {} # pageno : future
+		self.filling = False # pages是generator的时候, 生成页号的过程中可能还会调用read
+		self.hit = 0
+		self.miss = 0
+		self.submitted = 0
+		self._fill()
+
+	def _fill(self):
+		if self.filling:
+			return
+		self.filling = True
+		try:
+			while len(self.future) < self.depth:
+				pageno = next(self.pages,-1)
+				if pageno is None or pageno == -1:
+					break
+				if pageno in self.future:
+					continue
+				self.submitted += 1
+				self.future[pageno] = self.executor.submit(self.source.pread,pageno)
+		finally:
+			self.filling = False
+
+	def read(self,pageno):
+		if self.filling: # 生成页号的时候读的页(level 1), 不算预读
+			return self.source.read(pageno)
+		if pageno not in self.future:
+			self.miss += 1
+			data = self.source.read(pageno)
+		else:
+			for x in list(self.future): # 排在它前面的都没用上(跳过了/页缓存里有), 丢掉, 不然一直占着depth
+				if x == pageno:
+					break
+				self.future.pop(x).cancel()
+			self.hit += 1
+			data = self.future.pop(pageno).result()
+		self._fill()
+		return data
+
+	def read_extent(self,pageno,n):
+		return self.source.read_extent(pageno,n)
+
+	def pread(self,pageno):
+		return self.source.pread(pageno)
+
+	def size(self):
+		return self.source.size()
+
+	def page_count(self):
+		return self.source.page_count()
+
+	def stats(self):
+		rdata = self.source.stats()
+		total = self.hit + self.miss
+		rdata['prefetch_submitted'] = self.submitted
+		rdata['prefetch_hit'] = self.hit
+		rdata['prefetch_miss'] = self.miss
+		rdata['prefetch_hit_rate'] = f"{round(self.hit*100/total,2) if total else 0}%"
+		return rdata
+
+	def close(self):
+		self.executor.shutdown(wait=True)
+		self.future.clear()
+		self.source.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+
+PAGE_SOURCE = {
+	'file':page_source,
+	'mmap':mmap_source,
+	'direct':direct_source,
+}
+
+def open_page_source(filename,pagesize=16384,name='mmap'):
+	"""
+	按名字打开page source, mmap失败(空文件/块设备/32位系统上的大文件等)就退回到file
+	"""
+	try:
+		return PAGE_SOURCE[name](filename,pagesize)
+	except (ValueError,OSError,OverflowError):
+		if name == 'file':
+			raise
+		return page_source(filename,pagesize)
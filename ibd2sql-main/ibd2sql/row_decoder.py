@@ -0,0 +1,507 @@
+# 按表生成解析函数(row decoder)
+# ROW._read_field 每个字段每一行都要走一遍 if/elif 判断类型, 还有一堆dict查找.
+# 这里把每个字段怎么读在编译的时候就确定下来, 拼成python代码 compile一次, 缓存在TABLE上(table.decoder)
+import struct
+from ibd2sql.innodb_page import REC_2BYTE_EXTERN_MASK,_UNPACK_UINT
+from ibd2sql.mysql_json import json_text
+from ibd2sql.blob import first_blob
+from ibd2sql.charset import charset_decoder
+from ibd2sql.decimal_codec import get_decimal
+from ibd2sql.temporal_codec import get_temporal,column_fsp
+
+
+def read_extern(p,bdata):
+	"""
+	溢出页上的数据. bdata: 记录里的20字节(SPACE_ID,PAGENO,BLOB_HEADER,REAL_SIZE)
+	"""
+	SPACE_ID,PAGENO,BLOB_HEADER,REAL_SIZE = struct.unpack('>3LQ',bdata)
+	p.debug(f"SPACE_ID:{SPACE_ID}  PAGENO:{PAGENO} BLOB_HEADER:{BLOB_HEADER} REAL_SIZE:{REAL_SIZE}")
+	if p.table.mysqld_version_id > 50744: # 8.0环境
+		return first_blob(p.f,PAGENO)
+	_tdata = b''
+	while True:
+		_ndata = p.f.read(PAGENO) # FIL_PAGE_TYPE_BLOB
+		REAL_SIZE,PAGENO = struct.unpack('>LL',_ndata[38:46])
+		_tdata += _ndata[46:46+REAL_SIZE]
+		if PAGENO == 4294967295:
+			break
+	return _tdata
+
+
+def decode_json(_tdata):
+	return json_text(_tdata)
+
+
+def decode_char(p,_tdata,decode):
+	try:
+		return decode(_tdata)
+	except Exception as e:
+		p.debug(f"BLOB ERROR {e}")
+		return '0x'+_tdata.hex()
+
+
+def _decoder(col):
+	"""
+	字段的解码函数, 加载表结构的时候就选好了(col['decoder']), 没有的(手动构造的字段)按字符集现找
+	"""
+	return col['decoder'] if 'decoder' in col else charset_decoder(col['character_set'])
+
+
+def _decode_char(col,name,consts,cache):
+	"""
+	返回 f(变量名) -> 解码字符串的代码(赋值给v). cache: 这个字段的string_cache, 有的话先查缓存
+	"""
+	if cache is not None:
+		consts[name] = cache
+		return lambda var: f"v = decode_char(p,{var},{name}.get)"
+	consts[name] = _decoder(col)
+	return lambda var: f"v = decode_char(p,{var},{name})"
+
+
+def _varsize(lines,twobytes):
+	"""
+	变长字段的长度(1-2字节, 倒着读), 同 page._read_innodb_varsize
+	"""
+	lines.append("sz = b[r-1]; r -= 1")
+	if twobytes:
+		lines.append("if sz > 127:")
+		lines.append("\tsz = b[r-1] + (sz-128)*256; r -= 1")
+
+
+def _read_uint(n):
+	"""
+	读n字节大端无符号整数的表达式, 1,2,4,8字节的直接在页数据上unpack_from, 不切片
+	"""
+	return f"U{n}(b,o)[0]" if n in _UNPACK_UINT else f"int.from_bytes(b[o:o+{n}],'big')"
+
+
+def _field(col,name,SET,decimal=False,time_zone=None,cache=None):
+	"""
+	返回读这个字段的代码(赋值给v) 和需要用到的常量. 判断顺序和 ROW._read_field 一致
+	"""
+	n = col['size']
+	ct = col['ct']
+	lines = []
+	consts = {}
+	if col['isbig'] or col['isvar']:
+		if col['isvar'] and not col['isbig'] and col['character_set'] == "ascii" and ct == "char": # issue 9
+			lines.append(f"_t = bytes(b[o:o+{n}]); o += {n}")
+		else:
+			_varsize(lines,col['isbig'] or col['char_length'] > 255)
+			lines.append("if sz & REC_2BYTE_EXTERN_MASK:")
+			lines.append("\t_t = read_extern(p,b[o:o+20]); o += 20")
+			lines.append("else:")
+			if col['isbig'] and ct == "json": # json直接在页数据上解析, 不用复制出来
+				lines.append("\t_t = p.view[o:o+sz]; o += sz")
+			else:
+				lines.append("\t_t = bytes(b[o:o+sz]); o += sz")
+		if col['isbig'] and ct == "json":
+			lines.append("v = decode_json(_t)")
+		elif col['isbig'] and ct == "geom":
+			lines.append("v = int.from_bytes(_t,'big',signed=False)")
+		elif col['isbig'] and ct == "vector":
+			lines.append("v = '0x'+_t.hex()")
+		else:
+			lines.append(_decode_char(col,name,consts,cache)("_t"))
+	elif ct in ['int','tinyint','smallint','bigint','mediumint']:
+		lines.append(f"v = {_read_uint(n)}; o += {n}")
+		if not col['is_unsigned']:
+			_s = 2**(n*8-1)
+			lines.append(f"v = (v&{_s-1})-{_s} if v < {_s} else v&{_s-1}")
+	elif ct == 'float' and n == 4:
+		lines.append("v = unpack_float(b,o)[0]; o += 4")
+	elif ct == 'double' and n == 8:
+		lines.append("v = unpack_double(b,o)[0]; o += 8")
+	elif ct in ('float','double'):
+		lines.append(f"p.offset = o; v = p.read_innodb_{ct}({n}); o = p.offset")
+	elif ct == 'decimal':
+		consts[name] = get_decimal(col['extra'],decimal)
+		lines.append(f"v = {name}(b,o); o += {n}")
+	elif ct == 'set':
+		lines.append(f"v = {_read_uint(n)}; o += {n}")
+		if SET:
+			consts[name] = [ (1<<_sn,col['elements_dict'][x]) for _sn,x in enumerate(col['elements_dict']) ]
+			lines.append(f"v = repr(','.join([ _e for _b,_e in {name} if _b & v ]))")
+	elif ct == 'enum':
+		lines.append(f"v = {_read_uint(n)}; o += {n}")
+		if SET:
+			consts[name] = col['elements_dict']
+			lines.append(f"v = repr({name}[v])")
+	elif ct in ('time','datetime','date','timestamp'):
+		consts[name] = get_temporal(ct,n,column_fsp(col),time_zone)
+		lines.append(f"v = {name}(b,o); o += {n}")
+	elif ct == 'year':
+		lines.append(f"v = {_read_uint(n)} + 1900; o += {n}")
+	elif ct in ('bit','binary'):
+		lines.append(f"v = {_read_uint(n)}; o += {n}")
+	elif ct == 'tinyblob':
+		lines.append("sz = b[r-1]; r -= 1")
+		lines.append("v = '0x'+b[o:o+sz].hex(); o += sz")
+	else:
+		consts[name] = col
+		lines.append(f"p.debug('WARNING Unknown col:',{name})")
+		lines.append(f"v = bytes(b[o:o+{n}]); o += {n}")
+	return lines,consts
+
+
+# n字节的大端无符号整数用哪几个struct格式拼: (格式, 每个值左移多少位)
+_UINT = {1:('B',(0,)), 2:('H',(0,)), 3:('BH',(16,0)), 4:('L',(0,)), 5:('BL',(32,0)), 6:('HL',(32,0)), 7:('BHL',(48,32,0)), 8:('Q',(0,))}
+
+
+def _uint(n):
+	"""
+	返回 (struct格式, 值的个数, expr(us)->拼成整数的表达式)
+	"""
+	if n in _UINT:
+		fmt,shifts = _UINT[n]
+		return fmt,len(fmt),lambda us: "(" + "|".join([ f"{u}<<{s}" if s else u for u,s in zip(us,shifts) ]) + ")"
+	return f"{n}s",1,lambda us: f"int.from_bytes({us[0]},'big')"
+
+
+def _skip(col):
+	"""
+	跳过这个字段的代码: 只移动offset(变长的要读长度), 不解析, 溢出页也不读. 读的字节数和 _field 一样
+	"""
+	n = col['size']
+	lines = []
+	if col['isbig'] or col['isvar']:
+		if col['isvar'] and not col['isbig'] and col['character_set'] == "ascii" and col['ct'] == "char":
+			lines.append(f"o += {n}")
+		else:
+			_varsize(lines,col['isbig'] or col['char_length'] > 255)
+			lines.append("o += 20 if sz & REC_2BYTE_EXTERN_MASK else sz")
+	elif col['ct'] == 'tinyblob':
+		lines.append("sz = b[r-1]; r -= 1")
+		lines.append("o += sz")
+	else:
+		lines.append(f"o += {n}")
+	return lines
+
+
+def _fixed(col,name,SET,decimal=False,time_zone=None,cache=None):
+	"""
+	定长字段(不会是NULL的时候)用struct一次读出来, 返回 (struct格式, 值的个数, post(us,at)->赋值给v的代码, 常量), 不是定长的返回None
+	us: 这个字段unpack出来的变量名, at: 字段的offset(表达式). 结果和 _field 一样
+	"""
+	n = col['size']
+	ct = col['ct']
+	consts = {}
+	if col['isbig']:
+		return None
+	if col['isvar']:
+		if ct == "char" and col['character_set'] == "ascii": # issue 9
+			code = _decode_char(col,name,consts,cache)
+			return f"{n}s",1,lambda us,at: [code(us[0])],consts
+		return None
+	if ct in ['int','tinyint','smallint','bigint','mediumint','year','bit','binary','set','enum']:
+		fmt,nv,expr = _uint(n)
+		if ct in ('bit','binary') or (ct in ('set','enum') and not SET) or (ct not in ('year','set','enum') and col['is_unsigned']):
+			post = lambda us,at: [f"v = {expr(us)}"]
+		elif ct == 'year':
+			post = lambda us,at: [f"v = {expr(us)} + 1900"]
+		elif ct == 'set':
+			consts[name] = [ (1<<_sn,col['elements_dict'][x]) for _sn,x in enumerate(col['elements_dict']) ]
+			post = lambda us,at: [f"v = {expr(us)}",f"v = repr(','.join([ _e for _b,_e in {name} if _b & v ]))"]
+		elif ct == 'enum':
+			consts[name] = col['elements_dict']
+			post = lambda us,at: [f"v = repr({name}[{expr(us)}])"]
+		else: # 有符号的, 符号位是反的
+			post = lambda us,at: [f"v = {expr(us)} - {2**(n*8-1)}"]
+		return fmt,nv,post,consts
+	if ct == 'float' and n == 4:
+		return "4s",1,lambda us,at: [f"v = unpack_float({us[0]})[0]"],consts
+	if ct == 'double' and n == 8:
+		return "8s",1,lambda us,at: [f"v = unpack_double({us[0]})[0]"],consts
+	if ct in ('float','double'): # 这几个还是交给page去读
+		return f"{n}x",0,lambda us,at: [f"p.offset = {at}; v = p.read_innodb_{ct}({n})"],consts
+	if ct in ('time','datetime','date','timestamp'):
+		consts[name] = get_temporal(ct,n,column_fsp(col),time_zone)
+		return f"{n}x",0,lambda us,at: [f"v = {name}(b,{at})"],consts
+	if ct == 'decimal':
+		consts[name] = get_decimal(col['extra'],decimal)
+		return f"{n}x",0,lambda us,at: [f"v = {name}(b,{at})"],consts
+	return None
+
+
+def output_columns(table):
+	"""
+	要输出的字段(字段序号), 即SQL里VALUES的顺序: 去掉隐藏/虚拟/生成列和删除的字段
+	"""
+	return tuple([ colno for colno,col in table.column.items() if not (('hidden' in col and col['hidden'] > 1) or col['generation_expression'] != "" or col['is_virtual'] or col['version_dropped'] > 0) ])
+
+
+def compile_decoder(table,actions,SET=True,trace=False,check=False,compact=False,columns=None,where=None,decimal=False,time_zone=None,strings=()):
+	"""
+	actions: 记录里KEY之后的读取顺序(tuple), 每个元素:
+		('read',colno)             读字段
+		('skip',colno)             读了不要(前缀索引)
+		('rowid',)                 没得主键, 6字节的ROW_ID
+		('trx',)                   TRX(6) 和 ROLLPTR(7)
+		('nullable',colno,bit)     null bitmask 的第bit位为1就是NULL, 否则读字段
+		('value',colno,value)      不用读, 直接给值(instant的默认值, 删除的字段之类的)
+	返回 decode(p,nb) -> (data,trx,rollptr) 或 None(check时被过滤掉了)
+		p: page_cursor, p.offset 指向KEY, p._offset 指向null bitmask之前(变长字段长度)
+		nb: null bitmask
+		data: {字段序号:值}, compact时是按columns顺序的tuple
+	columns: 要的字段(字段序号), 默认compact时是output_columns, 否则是所有字段. 不要的字段只跳过(不解析/不读溢出页)
+	decimal: True时decimal字段解析成decimal.Decimal, 默认是字符串(decimal_codec)
+	time_zone: timestamp按哪个时区显示, 默认SYSTEM(本地时区), 见temporal_codec.parse_time_zone
+	strings: ((字段序号,string_cache),...) 这些字段解码的时候先查缓存(string_cache.py)
+	where: where.compile_where编译好的条件, 用到的字段一读完就判断, 不满足的直接返回None, 后面的字段就不解析了
+	trace: 每个字段读完都debug一下(名字, offset, 值), 不trace的时候生成的代码里没有debug
+	check: 读完trx/rollptr就按p.decoder的范围过滤, 不满足的直接返回None, 后面的字段就不解析了
+	不trace的时候, 连续的定长字段用一个struct.Struct一次读出来(见_fixed)
+	"""
+	namespace = {
+		'REC_2BYTE_EXTERN_MASK':REC_2BYTE_EXTERN_MASK,
+		'read_extern':read_extern,
+		'decode_json':decode_json,
+		'decode_char':decode_char,
+		'unpack_float':struct.Struct('f').unpack_from,
+		'unpack_double':struct.Struct('d').unpack_from,
+	}
+	namespace.update({ f"U{n}":_UNPACK_UINT[n] for n in _UNPACK_UINT })
+	if columns is None:
+		columns = output_columns(table) if compact else tuple(table.column)
+	strings = dict(strings)
+	def dst(colno): # 值存在哪
+		return f"c{colno}" if compact else f"d[{colno}]"
+	check_lines = [
+		"_f = p.decoder",
+		"if (trx and (trx <= _f.mintrx or trx >= _f.maxtrx)) or (rollptr and (rollptr <= _f.minrollptr or rollptr >= _f.maxrollptr)):",
+		"\treturn None",
+	]
+	wanted = set(columns) | set(where.columns if where is not None else ()) # 要解析的字段
+	pending = set(where.columns) if where is not None else set() # where还没读到的字段
+	def where_step():
+		namespace['W'] = where
+		lines = [f"if not W({','.join([ dst(colno) if compact else f'd.get({colno})' for colno in where.columns ])}):","\treturn None"]
+		return lines,None if trace else ("",0,0,lambda us,at: lines)
+	assigned = set()
+	steps = [] # 每个action: (普通的代码, 定长的话 (struct格式, 值的个数, 字节数, post(us,at)))
+	for i,x in enumerate(actions):
+		name = f"C{i}"
+		lines = []
+		fast = None
+		if x[0] in ('read','skip') and (x[0] == 'skip' or x[1] not in wanted): # 不要的字段, 只跳过不解析
+			col = table.column[x[1]]
+			lines += _skip(col)
+			if trace:
+				namespace[f"N{i}"] = col['name']
+				lines.append(f"p.debug('\\tSKIP',N{i},'---->',o)")
+			elif _fixed(col,name,SET,decimal,time_zone) is not None:
+				fast = (f"{col['size']}x",0,col['size'],lambda us,at: [])
+		elif x[0] == 'read':
+			col = table.column[x[1]]
+			_lines,consts = _field(col,name,SET,decimal,time_zone,strings.get(x[1]))
+			namespace.update(consts)
+			lines += _lines
+			lines.append(f"{dst(x[1])} = v")
+			assigned.add(x[1])
+			if trace:
+				namespace[f"N{i}"] = col['name']
+				lines.append(f"p.debug('\\tREAD',N{i},'---->',o,'data:',v)")
+			fixed = None if trace else _fixed(col,name,SET,decimal,time_zone,strings.get(x[1]))
+			if fixed is not None:
+				fmt,nv,post,consts = fixed
+				namespace.update(consts)
+				fast = (fmt,nv,col['size'],lambda us,at,post=post,store=lines[-1]: post(us,at) + [store])
+		elif x[0] == 'rowid':
+			lines.append("o += 6")
+			fast = ("6x",0,6,lambda us,at: [])
+		elif x[0] == 'trx':
+			lines.append("trx = int.from_bytes(b[o:o+6],'big'); rollptr = int.from_bytes(b[o+6:o+13],'big'); o += 13")
+			if check:
+				lines += check_lines
+			if not trace:
+				fast = ("HLBHL",5,13,lambda us,at: [f"trx = {us[0]}<<32|{us[1]}; rollptr = {us[2]}<<48|{us[3]}<<32|{us[4]}"] + (check_lines if check else []))
+		elif x[0] == 'nullable' and x[1] not in wanted:
+			lines = [f"if not nb & {1<<x[2]}:"] + [ f"\t{_l}" for _l in _skip(table.column[x[1]]) ]
+			if trace:
+				namespace[f"N{i}"] = table.column[x[1]]['name']
+				lines.append(f"p.debug('\\tSKIP',N{i},'---->',o)")
+		elif x[0] == 'nullable':
+			lines,consts = _field(table.column[x[1]],name,SET,decimal,time_zone,strings.get(x[1]))
+			namespace.update(consts)
+			lines = [f"if nb & {1<<x[2]}:","\tv = None","else:"] + [ f"\t{_l}" for _l in lines ]
+			lines.append(f"{dst(x[1])} = v")
+			assigned.add(x[1])
+			if trace:
+				namespace[f"N{i}"] = table.column[x[1]]['name']
+				lines.append(f"p.debug('\\tREAD',N{i},'---->',o,'data:',v)")
+		elif x[0] == 'value':
+			namespace[name] = x[2]
+			if x[1] in wanted:
+				lines.append(f"{dst(x[1])} = {name}")
+				assigned.add(x[1])
+			if trace:
+				namespace[f"N{i}"] = table.column[x[1]]['name']
+				lines.append(f"p.debug('\\tVALUE',N{i},'(NOT IN RECORD) data:',{name})")
+			else:
+				fast = ("",0,0,lambda us,at,lines=lines: lines)
+		steps.append((lines,fast))
+		if pending and x[0] != 'skip' and len(x) > 1 and x[1] in pending:
+			pending.discard(x[1])
+			if not pending:
+				steps.append(where_step())
+	if where is not None and (pending or not where.columns): # 有字段不在记录里(都是NULL)
+		steps.append(where_step())
+
+	# 连续的定长字段(至少2个)合成一个struct.Struct.unpack_from, 整条记录都是定长的就只unpack一次
+	body = []
+	run = []
+	structs = []
+	def flush():
+		fmt = "".join([ _f[0] for _l,_f in run ])
+		if len([ _f for _l,_f in run if _f[2] > 0 ]) < 2:
+			for _l,_f in run:
+				body.extend(_l)
+			run.clear()
+			return
+		sno = len(structs)
+		us = [ f"u{sno}_{j}" for j in range(sum([ _f[1] for _l,_f in run ])) ]
+		if us:
+			structs.append(fmt)
+			namespace[f"S{sno}"] = struct.Struct('>'+fmt).unpack_from
+		post = []
+		k = at = 0
+		for _l,_f in run:
+			post += _f[3](us[k:k+_f[1]],f"o+{at}" if at else "o")
+			k += _f[1]
+			at += _f[2]
+		if us:
+			body.append(f"{','.join(us)}, = S{sno}(b,o)")
+		body.extend(post)
+		body.append(f"o += {at}")
+		run.clear()
+	for lines,fast in steps:
+		if fast is None:
+			flush()
+			body.extend(lines)
+		else:
+			run.append((lines,fast))
+	flush()
+	src = "def decode(p,nb):\n\tb = p.bdata; o = p.offset; r = p._offset\n\ttrx = rollptr = None\n"
+	if compact:
+		src += "".join([ f"\tc{colno} = None\n" for colno in sorted(wanted) if colno not in assigned ])
+	else:
+		src += "\td = {}\n"
+	src += "".join([ f"\t{_l}\n" for _l in body ])
+	src += "\tp.offset = o; p._offset = r\n"
+	if compact:
+		src += f"\treturn ({''.join([ f'c{colno},' for colno in columns ])}),trx,rollptr\n"
+	else:
+		src += "\treturn d,trx,rollptr\n"
+	exec(compile(src,f"<row_decoder {table.get_name()}>",'exec'),namespace)
+	decode = namespace['decode']
+	decode.source = src
+	return decode
+
+
+def get_decoder(table,actions,**kwargs):
+	"""
+	同一张表同样的读取顺序(和选项)只编译一次
+	"""
+	key = (actions,tuple(sorted(kwargs.items())))
+	try:
+		return table.decoder[key]
+	except KeyError:
+		table.decoder[key] = compile_decoder(table,actions,**kwargs)
+		return table.decoder[key]
+
+
+def _in_version(col,row_version):
+	"""
+	8.0.29之后的instant add/drop column: 这个字段在这个版本的行里是否存在
+	"""
+	return (row_version >= col['version_added'] and (col['version_dropped'] == 0 or col['version_dropped'] > row_version)) or (col['version_dropped'] > row_version and row_version >= col['version_added'])
+
+
+def decode_plan(table,idxno,row_version=-1,instant_flag=False,column_count=-1,**kwargs):
+	"""
+	一种记录格式(row version/instant flag/字段数量)怎么读: (null bitmask的字节数, 解析函数)
+	row_version: 8.0.29+ 记录头有ROW VERSION FLAG的时候的行版本, 否则-1
+	instant_flag: 8.0.12-28 的instant add column (记录头有INSTANT FLAG, 记录里有字段数量)
+	column_count: instant_flag时记录里的字段数量(含trx,rollptr)
+	kwargs: 生成解析函数的选项, 见compile_decoder
+	"""
+	row_version_flag = row_version >= 0
+	instant = row_version_flag or instant_flag
+	column = table.column
+
+	#NULL BITMASK
+	if instant:
+		null_bitmask_count = 0
+		_t_COLUMN_COUNT = 2
+		for _phno,colno in table.column_ph:
+			_t_COLUMN_COUNT += 1
+			col = column[colno]
+			if row_version_flag:
+				if _in_version(col,row_version):
+					null_bitmask_count += 1 if col['is_nullable'] else 0
+			else:
+				if instant_flag and _t_COLUMN_COUNT > column_count:
+					break
+				null_bitmask_count += 1 if col['is_nullable'] else 0
+	else:
+		null_bitmask_count = table.null_bitmask_count
+
+	#KEY
+	actions = []
+	keys = set()
+	if idxno:
+		for colno,prefix_key,order in table.index[idxno]['element_col']:
+			if prefix_key == 0:
+				actions.append(('read',colno)) #pk 不需要判断null
+				keys.add(colno)
+			else:
+				actions.append(('skip',colno)) #前缀索引数据 SKIP IT.
+	else:
+		actions.append(('rowid',)) #没得主键, 6字节的ROW_ID
+	actions.append(('trx',))
+
+	#剩余字段
+	_nullable_count = -1
+	_t_COLUMN_COUNT = 2
+	for _phno,colno in table.column_ph:
+		_t_COLUMN_COUNT += 1
+		if colno in keys:
+			continue
+		col = column[colno]
+		if col['is_virtual']:
+			continue
+		if instant_flag and _t_COLUMN_COUNT >= column_count:
+			actions.append(('value',colno,None))
+		elif row_version_flag: # >=8.0.29 的online ddl
+			if _in_version(col,row_version):
+				if col['is_nullable']:
+					_nullable_count += 1
+					actions.append(('nullable',colno,_nullable_count))
+				else:
+					actions.append(('read',colno))
+			elif row_version < col['version_added']:
+				actions.append(('value',colno,col['default'] if not col['instant_null'] else None))
+			else:
+				actions.append(('value',colno,None))
+		elif not instant_flag and col['instant']: # 8.0.12-28 的online ddl, 读默认值
+			actions.append(('value',colno,col['default'] if not col['instant_null'] else None))
+		elif not instant and col['version_dropped'] > 0: # 删除的字段就不读了(无instant情况下)
+			actions.append(('value',colno,None))
+		elif col['is_nullable']:
+			_nullable_count += 1
+			actions.append(('nullable',colno,_nullable_count))
+		else:
+			actions.append(('read',colno))
+	return int((null_bitmask_count+7)/8),get_decoder(table,tuple(actions),**kwargs)
+
+
+def get_plan(table,idxno,row_version=-1,instant_flag=False,column_count=-1,**kwargs):
+	"""
+	decode_plan 按 (索引, row version, instant flag, 字段数量) 缓存在table上, 每条记录只查一次dict
+	"""
+	key = (idxno,row_version,instant_flag,column_count,tuple(sorted(kwargs.items())))
+	try:
+		return table.decode_plan[key]
+	except KeyError:
+		table.decode_plan[key] = decode_plan(table,idxno,row_version,instant_flag,column_count,**kwargs)
+		return table.decode_plan[key]
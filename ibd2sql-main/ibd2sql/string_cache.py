@@ -0,0 +1,74 @@
+# 字符串缓存: 状态码/国家/币种这种字段, 几十亿行里就几百个不同的值, 每个值都要解码再repr一次
+# 按字段缓存 原始字节 -> (解码之后的字符串, repr之后的SQL字面量), LRU, 按值的个数限制大小
+# 刚开始的WARMUP次查询统计命中率, 命中率够高才继续用, 不然就关掉(直接解码, 不再查缓存)
+from collections import OrderedDict
+
+WARMUP = 4096 # 前多少个值用来统计命中率(差不多就是前几页)
+MIN_HIT_RATE = 0.5 # 命中率低于这个就关掉
+
+
+def cacheable(col):
+	"""
+	char/varchar(不是binary的) 才缓存, text/blob这种大字段一般不会重复
+	"""
+	return col['ct'] in ('char','varbinary') and not col['isbig'] and col['character_set'] != 'binary'
+
+
+class string_cache(object):
+	"""
+	一个字段的缓存. 解析函数里调用 get(原始字节) -> 字符串, 拼SQL的时候调用 literal(字符串) -> SQL字面量
+	get会随着状态换掉: 统计中(_sample) -> 启用(_lookup) / 关掉(直接是decode)
+	"""
+	def __init__(self,name,decode,capacity=1024):
+		self.name = name
+		self.decode = decode
+		self.capacity = capacity
+		self.data = OrderedDict() # 原始字节 : 字符串
+		self.literals = {} # 字符串 : SQL字面量
+		self.hit = 0
+		self.miss = 0
+		self.evict = 0
+		self.state = 'sampling' # sampling/on/off
+		self.get = self._sample
+
+	def _put(self,bdata):
+		value = self.decode(bdata)
+		self.data[bdata] = value
+		self.literals[value] = repr(value)
+		if len(self.data) > self.capacity:
+			_,old = self.data.popitem(last=False)
+			self.literals.pop(old,None)
+			self.evict += 1
+		return value
+
+	def _lookup(self,bdata):
+		value = self.data.get(bdata)
+		if value is None:
+			self.miss += 1
+			return self._put(bdata)
+		self.hit += 1
+		self.data.move_to_end(bdata)
+		return value
+
+	def _sample(self,bdata):
+		value = self._lookup(bdata)
+		if self.hit + self.miss >= WARMUP:
+			if self.hit >= MIN_HIT_RATE*(self.hit+self.miss):
+				self.state = 'on'
+				self.get = self._lookup
+			else:
+				self.state = 'off'
+				self.get = self.decode
+				self.data.clear()
+				self.literals.clear()
+		return value
+
+	def literal(self,value):
+		"""
+		SQL字面量(同repr), 缓存里没有的现算
+		"""
+		return self.literals.get(value) or repr(value)
+
+	def stats(self):
+		total = self.hit + self.miss
+		return f"{round(self.hit*100/total,2) if total else 0}% ({self.state}, hit:{self.hit} miss:{self.miss} evict:{self.evict} size:{len(self.data)})"
@@ -0,0 +1,185 @@
+# 时间类型(date/datetime/time/timestamp)解析, 输出和MySQL一样的格式(补0): '2024-01-05 03:04:05.120'
+# 每个字段按 (类型, 字节数, 小数位数, 时区) 生成一个 decode(b,o), 各部分的位置(移位, 掩码)是固定的, 两位数直接查表(_D2)
+# timestamp 是UTC的秒数, 要按时区转换. 同一批数据的时间一般都挨得很近, 所以按秒缓存转换好的 'YYYY-MM-DD HH:MM:SS' (LRU)
+import re
+import time
+import datetime
+from functools import lru_cache
+try:
+	from zoneinfo import ZoneInfo
+except ImportError: # python3.9之前没得zoneinfo, 就只支持SYSTEM和+08:00这种
+	ZoneInfo = None
+
+TIMESTAMP_CACHE_SIZE = 65536 # 每个时区缓存多少个秒
+
+_D2 = tuple([ f"{i:02d}" for i in range(100) ])
+_D4 = tuple([ f"{i:04d}" for i in range(16384) ]) # date的年是14位
+
+_TIMEF_INT_OFS = 0x800000
+_TIMEF_OFS = 0x800000000000
+
+_CODEC = {} # (类型, 字节数, 小数位数, 时区) : 解析函数
+_TIMESTAMP = {} # 时区 : 秒->'YYYY-MM-DD HH:MM:SS'
+
+
+def parse_time_zone(time_zone):
+	"""
+	SYSTEM(或None): 本地时区(time.localtime)  +08:00/-05:30: 固定偏移  UTC/Asia/Shanghai: IANA时区名(zoneinfo)
+	返回 None(SYSTEM) / 偏移的秒数(int) / tzinfo, 不认识的报ValueError
+	"""
+	if time_zone is None or time_zone.upper() in ('SYSTEM',''):
+		return None
+	m = re.fullmatch(r'([+-])(\d{1,2}):(\d{2})',time_zone.strip())
+	if m:
+		offset = int(m.group(2))*3600 + int(m.group(3))*60
+		if int(m.group(2)) > 14 or int(m.group(3)) > 59:
+			raise ValueError(f"invalid time zone: {time_zone!r}")
+		return -offset if m.group(1) == '-' else offset
+	if time_zone.upper() in ('UTC','GMT','Z'):
+		return 0
+	if ZoneInfo is None:
+		raise ValueError(f"time zone {time_zone!r} need zoneinfo(python3.9+), use +HH:MM instead")
+	try:
+		return ZoneInfo(time_zone)
+	except Exception:
+		raise ValueError(f"unknown time zone: {time_zone!r}")
+
+
+def timestamp_prefix(time_zone=None):
+	"""
+	返回 秒数 -> 'YYYY-MM-DD HH:MM:SS' (time_zone时区), 带LRU缓存, 同一个时区共用一个
+	"""
+	try:
+		return _TIMESTAMP[time_zone]
+	except KeyError:
+		pass
+	tz = parse_time_zone(time_zone)
+	if tz is None:
+		def convert(seconds):
+			t = time.localtime(seconds)
+			return f"{_D4[t.tm_year]}-{_D2[t.tm_mon]}-{_D2[t.tm_mday]} {_D2[t.tm_hour]}:{_D2[t.tm_min]}:{_D2[t.tm_sec]}"
+	elif isinstance(tz,int):
+		def convert(seconds):
+			t = time.gmtime(seconds+tz)
+			return f"{_D4[t.tm_year]}-{_D2[t.tm_mon]}-{_D2[t.tm_mday]} {_D2[t.tm_hour]}:{_D2[t.tm_min]}:{_D2[t.tm_sec]}"
+	else:
+		def convert(seconds):
+			return datetime.datetime.fromtimestamp(seconds,tz).strftime('%Y-%m-%d %H:%M:%S')
+	_TIMESTAMP[time_zone] = lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)(convert)
+	return _TIMESTAMP[time_zone]
+
+
+def _fraction(base,n,fsp):
+	"""
+	小数秒部分: 每2位占1字节(大端). 返回 (读小数部分的代码, 格式化的代码), fsp是0的时候都是空的
+	"""
+	if n <= base or fsp <= 0:
+		return "",""
+	div = 10**(2*(n-base)-fsp) # fsp是奇数的时候存的多一位(是0)
+	read = f"f = int.from_bytes(b[o+{base}:o+{n}],'big')" + (f" // {div}" if div > 1 else "")
+	return read,f".{{f:0{fsp}d}}"
+
+
+def _date_src(n,fsp,time_zone):
+	return [
+		"v = (b[o]<<16)|(b[o+1]<<8)|b[o+2]",
+		"s = '' if v & 8388608 else '-'",
+		"return f'{s}{D4[(v>>9)&16383]}-{D2[(v>>5)&15]}-{D2[v&31]}'",
+	]
+
+
+def _datetime_src(n,fsp,time_zone):
+	read,frac = _fraction(5,n,fsp)
+	return [
+		"v = int.from_bytes(b[o:o+5],'big')",
+		"ym = (v>>22)&131071",
+		"s = '' if v & 549755813888 else '-'",
+	] + ([read] if read else []) + [
+		f"return f'{{s}}{{D4[ym//13]}}-{{D2[ym%13]}}-{{D2[(v>>17)&31]}} {{D2[(v>>12)&31]}}:{{D2[(v>>6)&63]}}:{{D2[v&63]}}{frac}'",
+	]
+
+
+def _time_src(n,fsp,time_zone):
+	"""
+	TIME2 (同MySQL my_time_packed_from_binary): 整数部分加了0x800000, 负数的小数部分要借位
+	"""
+	lines = []
+	if n >= 6: # 5,6位小数, 整个48位一起偏移
+		lines.append(f"v = int.from_bytes(b[o:o+6],'big') - {_TIMEF_OFS}")
+	elif n > 3: # 1-4位小数
+		lines.append(f"i = ((b[o]<<16)|(b[o+1]<<8)|b[o+2]) - {_TIMEF_INT_OFS}")
+		lines.append(f"f = int.from_bytes(b[o+3:o+{n}],'big')")
+		lines.append("if i < 0 and f:")
+		lines.append(f"\ti += 1; f -= {1<<(8*(n-3))}")
+		lines.append(f"v = (i<<24) + f*{10000 if n == 4 else 100}")
+	else:
+		lines.append(f"v = (((b[o]<<16)|(b[o+1]<<8)|b[o+2]) - {_TIMEF_INT_OFS})<<24")
+	lines.append("if v < 0:")
+	lines.append("\tv = -v; s = '-'")
+	lines.append("else:")
+	lines.append("\ts = ''")
+	lines.append("h = v>>24")
+	frac = ""
+	if n > 3 and fsp > 0:
+		lines.append(f"f = (v&16777215)" + (f" // {10**(6-fsp)}" if fsp < 6 else ""))
+		frac = f".{{f:0{fsp}d}}"
+	lines.append(f"return f'{{s}}{{(h>>12)&1023:02d}}:{{D2[(h>>6)&63]}}:{{D2[h&63]}}{frac}'")
+	return lines
+
+
+def _timestamp_src(n,fsp,time_zone):
+	read,frac = _fraction(4,n,fsp)
+	zero = "0000-00-00 00:00:00" + ("."+"0"*fsp if frac else "")
+	return [
+		"v = (b[o]<<24)|(b[o+1]<<16)|(b[o+2]<<8)|b[o+3]",
+	] + ([read] if read else []) + [
+		"if v == 0" + (" and f == 0" if frac else "") + ":",
+		f"\treturn '{zero}'",
+		f"return f'{{TS(v)}}{frac}'",
+	]
+
+
+_SRC = {
+	'date':_date_src,
+	'datetime':_datetime_src,
+	'time':_time_src,
+	'timestamp':_timestamp_src,
+}
+
+
+def compile_temporal(ct,n,fsp=None,time_zone=None):
+	"""
+	生成 decode(b,o) -> 字符串. ct: date/datetime/time/timestamp  n: 字节数
+	fsp: 小数位数, None就按字节数算(每字节2位)  time_zone: 只有timestamp用, 见parse_time_zone
+	"""
+	base = {'date':3,'datetime':5,'time':3,'timestamp':4}[ct]
+	if fsp is None:
+		fsp = 2*(n-base)
+	src = "def decode(b,o):\n" + "".join([ f"\t{x}\n" for x in _SRC[ct](n,fsp,time_zone) ])
+	namespace = {'D2':_D2,'D4':_D4}
+	if ct == 'timestamp':
+		namespace['TS'] = timestamp_prefix(time_zone)
+	exec(compile(src,f"<{ct}({fsp})>",'exec'),namespace)
+	decode = namespace['decode']
+	decode.source = src
+	return decode
+
+
+def column_fsp(col):
+	"""
+	字段的小数秒位数, datetime(3) -> 3
+	"""
+	m = re.search(r'\((\d+)\)',col.get('column_type_utf8',''))
+	return int(m.group(1)) if m else 0
+
+
+def get_temporal(ct,n,fsp=None,time_zone=None):
+	"""
+	同类型同精度同时区的字段共用一个解析函数
+	"""
+	key = (ct,n,fsp,time_zone)
+	try:
+		return _CODEC[key]
+	except KeyError:
+		_CODEC[key] = compile_temporal(ct,n,fsp,time_zone)
+		return _CODEC[key]
@@ -0,0 +1,274 @@
+# 字段上的过滤条件(--where), 编译成一个python函数, 由row_decoder在读完用到的字段之后就调用, 不满足就不往下解析了
+# 支持: = != <> < <= > >=, [NOT] IN (...), [NOT] BETWEEN x AND y, IS [NOT] NULL, [NOT] LIKE 'prefix%', AND OR 括号
+# 例: tenant_id = 42 AND (status IN ('a','b') OR name LIKE 'abc%') AND created >= '2024-01-01'
+# 和SQL一样, NULL和任何值比较都不满足(NOT IN/NOT BETWEEN/!= 也一样)
+# 字符串的 = 和 LIKE 是按解析出来的字符串直接比较的: 区分大小写, 尾部空格也算(不像MySQL默认的排序规则 _ci/PAD SPACE)
+import re
+import ast
+from decimal import Decimal,InvalidOperation
+from ibd2sql.row_decoder import output_columns
+
+_TOKEN = re.compile(r"""\s*(?:
+	(?P<num>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)|
+	(?P<str>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")|
+	(?P<name>`[^`]+`|[A-Za-z_][A-Za-z0-9_$]*)|
+	(?P<op><=|>=|<>|!=|=|<|>|\(|\)|,)
+)""",re.X)
+
+_KEYWORDS = ('AND','OR','NOT','IN','BETWEEN','IS','NULL','LIKE')
+
+_INT = ('tinyint','smallint','mediumint','int','bigint','year','bit','binary','geom')
+_TIME = ('date','datetime','time','timestamp')
+
+
+def _tokens(text):
+	"""
+	返回 [(类型,值)], 类型: num str name kw op
+	"""
+	rdata = []
+	pos = 0
+	text = text.rstrip()
+	while pos < len(text):
+		m = _TOKEN.match(text,pos)
+		if m is None or m.end() == pos:
+			raise ValueError(f"WHERE syntax error near: {text[pos:pos+20]!r}")
+		pos = m.end()
+		kind = m.lastgroup
+		value = m.group(kind)
+		if kind == 'str':
+			q = value[0]
+			value = re.sub(r"\\(.)",r"\1",value[1:-1].replace(q+q,q))
+		elif kind == 'name' and value.startswith('`'):
+			value = value[1:-1]
+		elif kind == 'name' and value.upper() in _KEYWORDS:
+			kind,value = 'kw',value.upper()
+		rdata.append((kind,value))
+	return rdata
+
+
+def _micro(frac):
+	"""
+	小数秒 -> 微秒: '12' -> 120000, '120000' -> 120000
+	"""
+	return int(frac[:6].ljust(6,'0')) if frac else 0
+
+
+def _datetime_key(v):
+	"""
+	date/datetime/timestamp 统一成定长的 (年,月,日,时,分,秒,微秒) 比较, date就是当天0点
+	'2024-01-01' = '2024-01-01 00:00:00', '2020-9-5 8:20:20' 这种没补0的也行, 20240101/20240101082020 这种数字也行
+	"""
+	v = str(v).strip()
+	m = re.search(r'(:\d+)\.(\d*)$',v) # 小数秒只能跟在秒后面
+	frac = ''
+	if m:
+		v,frac = v[:m.end(1)],m.group(2)
+	n = re.findall(r'\d+',v)
+	if len(n) == 1 and len(n[0]) in (8,14): # YYYYMMDD[HHMMSS]
+		n = re.findall(r'(\d{4})(\d\d)(\d\d)(\d\d)?(\d\d)?(\d\d)?',n[0])[0]
+	n = [ int(x) for x in n if x != '' ][:6]
+	if len(n) < 3:
+		raise ValueError(f"invalid date: {v!r}")
+	return tuple(n + [0]*(6-len(n))) + (_micro(frac),)
+
+
+def _time_key(v):
+	"""
+	time 统一成 (时,分,秒,微秒) 比较, 负数取反. 'D HH:MM:SS' 'HH:MM' 'HHMMSS' 都行(同MySQL)
+	"""
+	v = str(v).strip()
+	sign = -1 if v.startswith('-') else 1
+	v,_,frac = v.lstrip('-').partition('.')
+	days = 0
+	if ' ' in v:
+		days,v = v.split(None,1)
+		days = int(days)
+	if ':' in v:
+		n = [ int(x) for x in v.split(':') ][:3]
+	elif v.isdigit(): # HHMMSS, MMSS, SS
+		n = [ int(v[:-4] or 0),int(v[-4:-2] or 0),int(v[-2:]) ]
+	else:
+		raise ValueError(f"invalid time: {v!r}")
+	n = n + [0]*(3-len(n))
+	n[0] += days*24
+	return tuple([ sign*x for x in n ]) + (sign*_micro(frac),)
+
+
+def _column_key(col,SET):
+	"""
+	返回 (key函数, 常量转换函数): 解析出来的值 -> 用来比较的值.  key函数为None表示直接比较
+	"""
+	ct = col['ct']
+	if ct in _INT:
+		return None,lambda x: int(x) if re.fullmatch(r'-?\d+',str(x)) else float(x)
+	if ct in ('float','double'):
+		return None,float
+	if ct == 'decimal':
+		return Decimal,Decimal
+	if ct == 'time':
+		return _time_key,_time_key
+	if ct in _TIME:
+		return _datetime_key,_datetime_key
+	if ct == 'enum' and SET: # 解析出来是repr(名字)
+		names = { repr(x):x for x in col['elements_dict'].values() }
+		return lambda v: names[v] if v in names else ast.literal_eval(v),str
+	if ct == 'set' and SET:
+		return ast.literal_eval,str
+	if ct in ('enum','set'):
+		return None,int
+	return None,str
+
+
+class _parser(object):
+	def __init__(self,text,table,SET):
+		self.tokens = _tokens(text)
+		self.pos = 0
+		self.table = table
+		self.SET = SET
+		self.names = { table.column[colno]['name'].lower():colno for colno in output_columns(table) }
+		self.refs = [] # 用到的字段(字段序号), 函数参数的顺序
+		self.consts = {}
+
+	def peek(self,n=0):
+		return self.tokens[self.pos+n] if self.pos+n < len(self.tokens) else (None,None)
+
+	def take(self,kind=None,value=None):
+		t = self.peek()
+		if t[0] is None or (kind is not None and t[0] != kind) or (value is not None and t[1] != value):
+			raise ValueError(f"WHERE syntax error: expect {value or kind}, got {t[1]!r}")
+		self.pos += 1
+		return t
+
+	def accept(self,kind,value):
+		if self.peek() == (kind,value):
+			self.pos += 1
+			return True
+		return False
+
+	def const(self,value):
+		name = f"L{len(self.consts)}"
+		self.consts[name] = value
+		return name
+
+	def parse(self):
+		expr = self.or_expr()
+		if self.peek()[0] is not None:
+			raise ValueError(f"WHERE syntax error near: {self.peek()[1]!r}")
+		return expr
+
+	def or_expr(self):
+		exprs = [self.and_expr()]
+		while self.accept('kw','OR'):
+			exprs.append(self.and_expr())
+		return exprs[0] if len(exprs) == 1 else "(" + " or ".join(exprs) + ")"
+
+	def and_expr(self):
+		exprs = [self.primary()]
+		while self.accept('kw','AND'):
+			exprs.append(self.primary())
+		return exprs[0] if len(exprs) == 1 else "(" + " and ".join(exprs) + ")"
+
+	def primary(self):
+		if self.accept('op','('):
+			expr = self.or_expr()
+			self.take('op',')')
+			return expr
+		return self.predicate()
+
+	def literal(self,col):
+		kind,value = self.take()
+		if kind not in ('num','str'):
+			raise ValueError(f"WHERE: expect a value for `{col['name']}`, got {value!r}")
+		try:
+			return self.const(self.convert(value))
+		except (ValueError,TypeError,InvalidOperation):
+			raise ValueError(f"WHERE: {value!r} is not a valid value for `{col['name']}` ({col['type']})")
+
+	def predicate(self):
+		kind,name = self.take('name')
+		if name.lower() not in self.names:
+			raise ValueError(f"WHERE: column `{name}` not in {self.table.get_name()}")
+		colno = self.names[name.lower()]
+		col = self.table.column[colno]
+		if colno not in self.refs:
+			self.refs.append(colno)
+		k = f"k{self.refs.index(colno)}"
+		key,self.convert = _column_key(col,self.SET)
+		if self.accept('kw','IS'):
+			negate = self.accept('kw','NOT')
+			self.take('kw','NULL')
+			return f"{k} is not None" if negate else f"{k} is None"
+		negate = self.accept('kw','NOT')
+		if self.accept('kw','IN'):
+			self.take('op','(')
+			values = [self.literal(col)]
+			while self.accept('op',','):
+				values.append(self.literal(col))
+			self.take('op',')')
+			return f"({k} is not None and {k} {'not in' if negate else 'in'} ({','.join(values)},))"
+		if self.accept('kw','BETWEEN'):
+			lo = self.literal(col)
+			self.take('kw','AND')
+			hi = self.literal(col)
+			return f"({k} is not None and {'not ' if negate else ''}{lo} <= {k} <= {hi})"
+		if self.accept('kw','LIKE'):
+			kind,pattern = self.take('str')
+			prefix,exact = self._like_prefix(pattern)
+			p = self.const(prefix)
+			v = k if key is not None and col['ct'] in ('enum','set') else f"v{self.refs.index(colno)}"
+			test = f"str({v}) == {p}" if exact else f"str({v}).startswith({p})"
+			return f"({v} is not None and {'not ' if negate else ''}{test})"
+		if negate:
+			raise ValueError(f"WHERE syntax error: NOT must be followed by IN/BETWEEN/LIKE")
+		kind,op = self.take('op')
+		if op not in ('=','!=','<>','<','<=','>','>='):
+			raise ValueError(f"WHERE syntax error: unknown operator {op!r}")
+		op = {'=':'==','<>':'!='}.get(op,op)
+		return f"({k} is not None and {k} {op} {self.literal(col)})"
+
+	def _like_prefix(self,pattern):
+		"""
+		只支持前缀匹配: 'abc%' (\\% \\_ 转义), 没有%的就是等于. 返回 (前缀, 是否等于)
+		"""
+		prefix = ''
+		i = 0
+		while i < len(pattern):
+			c = pattern[i]
+			if c == '\\' and i+1 < len(pattern):
+				prefix += pattern[i+1]
+				i += 2
+				continue
+			if c == '%' and i == len(pattern)-1:
+				return prefix,False
+			if c in '%_':
+				raise ValueError(f"WHERE: only prefix LIKE ('abc%') is supported, got {pattern!r}")
+			prefix += c
+			i += 1
+		return prefix,True
+
+
+def compile_where(text,table,SET=True):
+	"""
+	把WHERE条件编译成函数 where(v0,v1,...) -> True/False, 参数是用到的字段的值(解析出来的值, 同row_decoder)
+	where.columns: 用到的字段(字段序号), 参数的顺序
+	where.text: 条件原文
+	语法错误/字段不存在/值类型不对 都是ValueError
+	"""
+	p = _parser(text,table,SET)
+	expr = p.parse()
+	namespace = dict(p.consts)
+	src = f"def where({','.join([ f'v{i}' for i in range(len(p.refs)) ])}):\n"
+	for i,colno in enumerate(p.refs):
+		key,convert = _column_key(table.column[colno],SET)
+		if key is None:
+			src += f"\tk{i} = v{i}\n"
+		else:
+			namespace[f"K{i}"] = key
+			src += f"\tk{i} = None if v{i} is None else K{i}(v{i})\n"
+	src += f"\treturn {expr}\n"
+	exec(compile(src,f"<where {table.get_name()}>",'exec'),namespace)
+	where = namespace['where']
+	where.columns = tuple(p.refs)
+	where.text = text
+	where.source = src
+	return where
@@ -57,6 +57,7 @@ signal.signal(signal.SIGINT, signal_15_handler)  # ctrl+c
 # ibd文件初始化
 ddcw = ibd2sql()
 ddcw.FILENAME = filename
+ddcw.CACHE_SIZE = 64*1024*1024 # 来回点页面会反复从根页往下找(非叶子页), 压缩/加密表的页也要反复解压/解密
 ddcw.init()
 INDEX = []
 for x in ddcw.table.index:
@@ -145,11 +146,11 @@ class PAGE(page):
 		is_unsigned = col['is_unsigned']
 		if col['isvar']:
 			size = self._read_innodb_varsize(col['char_length'])
-			if size + self.offset > 16384:
+			if size & REC_2BYTE_EXTERN_MASK:
 				SPACE_ID,PAGENO,BLOB_HEADER,REAL_SIZE = struct.unpack('>3LQ',self.read(20))
 				_tdata = first_blob(self.f,PAGENO)
 			else:
-				_tdata = self.read(size)
+				_tdata = bytes(self.read(size))
 			if col['ct'] == "json":
 				data = jsonob(_tdata[1:],int.from_bytes(_tdata[:1],'little')).init()
 				data = json.dumps(data)
@@ -196,9 +197,9 @@ class PAGE(page):
 			data = self._read_uint(n)
 		elif col['ct'] == 'tinytext':
 			s = int.from_bytes(self.readreverse(1),'big')
-			data = self.read(s).decode()
+			data = bytes(self.read(s)).decode()
 		else:
-			data = self.read(n)
+			data = bytes(self.read(n))
 		return data
 
 	def read_rec_trx_rollptr(self):
@@ -274,7 +275,7 @@ def idx_page(idxno,pageno):
 	#	sqls.append(f"{sql}{ddcw._tosql(x['row'])};")
 	#return str(sqls)
 	rdata = []
-	pg = PAGE(data,f=ddcw.f,idxno=idxno,table=ddcw.table)
+	pg = PAGE(data,f=ddcw,idxno=idxno,table=ddcw.table)
 	pg.offset = 99
 	while True:
 		dd = {}
@@ -285,7 +286,7 @@ def idx_page(idxno,pageno):
 		if rec_header.record_type == 3: # MAX
 			break
 		elif rec_header.record_type == 2: # min
-			pg.offset = offset + rec_header.next_record
+			pg.offset = pg._next_rec(offset,rec_header.next_record)
 			continue
 		dd['rec_header'] = {
 			'instant_flag':rec_header.instant_flag,
@@ -314,7 +315,7 @@ def idx_page(idxno,pageno):
 			dd['pageid'] = pg.read_rec_pageid()
 		rdata.append(dd)
 
-		pg.offset = offset + rec_header.next_record
+		pg.offset = pg._next_rec(offset,rec_header.next_record)
 	page_header = dict([ (x,getattr(pg.page_header,x)) for x in  pg.page_header.__dict__ if x.startswith('PAGE_') and x != 'PAGE_BTR_SEG_LEAF' and x != 'PAGE_BTR_SEG_TOP' ])
 	page_header['PAGE_BTR_SEG_LEAF'] = {
 		'SAPCE_ID':pg.page_header.PAGE_BTR_SEG_LEAF.SAPCE_ID,
@@ -9,8 +9,11 @@ import sys
 import os
 import chardet
 import struct
+import signal
 from ibd2sql import CRC32C
+from ibd2sql.innodb_page_spaceORxdes import read_page_size,xdes_layout
 from ibd2sql import frm2sdi
+from ibd2sql.temporal_codec import parse_time_zone
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'ibd2sql/')))
 
@@ -42,13 +45,22 @@ def _argparse():
     # where条件
     parser.add_argument('--where-trx', dest="WHERE_TRX", help='default (0,281474976710656)')
     parser.add_argument('--where-rollptr', dest="WHERE_ROLLPTR", help='default (0,72057594037927936)')
-    # parser.add_argument('--where', dest="WHERE", help='filter data(TODO)')
+    parser.add_argument('--where', dest="WHERE",
+                        help="filter data by columns, like: \"id > 10 AND name LIKE 'abc%%'\"")
     parser.add_argument('--limit', dest="LIMIT", type=int, help='limit rows')
+    parser.add_argument('--columns', dest="COLUMNS",
+                        help='only decode and print these columns, like: id,name (other columns are skipped, not decoded)')
+    parser.add_argument('--time-zone', dest="TIME_ZONE",
+                        help='time zone of TIMESTAMP values: SYSTEM (default), +08:00, UTC, Asia/Shanghai')
+    parser.add_argument('--string-cache', dest="STRING_CACHE", type=int, default=1024,
+                        help='cache N decoded values per CHAR/VARCHAR column, kept only if hit rate is high on the first pages. 0: off (default 1024)')
 
     # DEBUG相关, 方便调试
     parser.add_argument('--debug', '-D', action='store_true', dest="DEBUG", default=False,
                         help="will DEBUG (it's too big)")
     parser.add_argument('--debug-file', dest="DEBUG_FILE", help='default sys.stdout if DEBUG')
+    parser.add_argument('--debug-level', dest="DEBUG_LEVEL", type=int, choices=[1, 2, 3],
+                        help='DEBUG detail of data pages: 1 per page, 2 per record (default), 3 per field. implies --debug')
     parser.add_argument('--page-min', action='store', type=int, dest="PAGE_MIN", default=0,
                         help='if PAGE NO less than it, will break')
     parser.add_argument('--page-max', action='store', type=int, dest="PAGE_MAX", default=4294967296,
@@ -64,6 +76,36 @@ def _argparse():
     # TODO
     # parser.add_argument('--parallel','-p', action='store', dest="PARALLEL", default=4,  help='parse to data/sql with N threads.(default 4) TODO')
 
+    # 读页的方式
+    parser.add_argument('--page-source', action='store', dest="PAGE_SOURCE", default='mmap', choices=['mmap', 'file', 'direct'],
+                        help='how to read pages: mmap (default, zero-copy), file (seek+read) or direct (O_DIRECT/fadvise DONTNEED, does not pollute the OS page cache)')
+
+    parser.add_argument('--demux', action='store', dest="DEMUX", default=None,
+                        help='for tablespaces with many tables (general tablespace/ibdata1): scan the file once and write each table to DIR/schema.table.sql')
+
+    parser.add_argument('--scan-order', action='store', dest="SCAN_ORDER", default='leaf',
+                        choices=['leaf', 'physical', 'physical-sorted'],
+                        help='leaf: follow the leaf page list (default). physical: read leaf pages in file order (faster, rows not in PK order). physical-sorted: read in file order but output in PK order')
+    parser.add_argument('--read-ahead', action='store', type=int, dest="READ_AHEAD", default=0,
+                        help='read whole extents (64 pages) in one IO and keep N of them buffered, 0: disabled (default)')
+
+    parser.add_argument('--prefetch', action='store', type=int, dest="PREFETCH", default=0,
+                        help='read the leaf page list from level 1 pages and fetch up to N leaf pages ahead with concurrent pread, 0: disabled (default)')
+
+    # 限速
+    parser.add_argument('--max-mbps', action='store', type=float, dest="MAX_MBPS", default=0,
+                        help='limit read throughput to N MB/s (token bucket), 0: unlimited (default). SIGUSR1 doubles / SIGUSR2 halves the limits at runtime')
+    parser.add_argument('--max-iops', action='store', type=float, dest="MAX_IOPS", default=0,
+                        help='limit read IOPS to N, 0: unlimited (default)')
+    parser.add_argument('--throttle-file', action='store', dest="THROTTLE_FILE", default=None,
+                        help='control file to change the limits at runtime, lines like max_mbps=N / max_iops=N (checked every second)')
+
+    parser.add_argument('--stats', action='store_true', dest="STATS", default=False,
+                        help='print IO statistics (bytes read, MB/s, read-ahead/prefetch/cache hit rate) to stderr at the end')
+
+    parser.add_argument('--cache-size', action='store', type=int, dest="CACHE_SIZE", default=0,
+                        help='page cache size in MB (decompressed/decrypted pages, non-leaf and LOB pages, LRU), 0: disabled (default)')
+
     # keyring file
     parser.add_argument('--keyring-file', '-k', action='store', dest="KEYRING_FILE", default='',
                         help='keyring filename')
@@ -110,6 +152,14 @@ if __name__ == '__main__':
     # 初始化一个ibd2sql对象, 然后设置它的属性
     ddcw = ibd2sql()
     ddcw.FILENAME = parser.FILENAME
+    ddcw.PAGE_SOURCE = parser.PAGE_SOURCE
+    ddcw.READ_AHEAD = parser.READ_AHEAD
+    ddcw.SCAN_ORDER = parser.SCAN_ORDER
+    ddcw.PREFETCH = parser.PREFETCH
+    ddcw.MAX_MBPS = parser.MAX_MBPS
+    ddcw.MAX_IOPS = parser.MAX_IOPS
+    ddcw.THROTTLE_FILE = parser.THROTTLE_FILE
+    ddcw.CACHE_SIZE = parser.CACHE_SIZE*1024*1024
     # 判断keyring file
     kd = {}
     if parser.KEYRING_FILE != '' and os.path.exists(parser.KEYRING_FILE):
@@ -133,12 +183,15 @@ if __name__ == '__main__':
 
     # 读ibd的fsp中的key和iv
     # 自动检测文件编码
+    PAGE_SIZE = read_page_size(filename)
+    XDES_COUNT, XDES_SIZE = xdes_layout(PAGE_SIZE)
     with open(filename, 'rb') as f:
-        fsp = f.read(16384)
-        if len(fsp) != 16384:
+        fsp = f.read(PAGE_SIZE)
+        if len(fsp) != PAGE_SIZE:
             sys.stderr.write(f"\n ibd file {filename} is not correct\n\n")
             sys.exit(12)
-        data = fsp[10390:10390 + 115]
+        offset = 38 + 112 + XDES_COUNT * XDES_SIZE  # 16K: 10390
+        data = fsp[offset:offset + 115]
         if data != b'\x00' * 115 and len(kd) == 0:
             sys.stderr.write(f"\n ibd file {filename} is ENCRYPTED, please with --keyring-file='xxxxx'\n\n")
             sys.exit(14)
@@ -167,6 +220,9 @@ if __name__ == '__main__':
 
     if parser.DEBUG:
         ddcw.DEBUG = True
+    if parser.DEBUG_LEVEL:
+        ddcw.DEBUG = True
+        ddcw.DEBUG_LEVEL = parser.DEBUG_LEVEL
     if parser.SDI_TABLE:
         ddcw.IS_PARTITION = True
 
@@ -229,6 +285,9 @@ if __name__ == '__main__':
 
     # 初始化, 解析表
     ddcw.init()
+    if ddcw.THROTTLE is not None and hasattr(signal,'SIGUSR1'): # 业务低峰期可以 kill -USR1 加速
+        signal.signal(signal.SIGUSR1, lambda signum,frame: ddcw.THROTTLE.scale(2))
+        signal.signal(signal.SIGUSR2, lambda signum,frame: ddcw.THROTTLE.scale(0.5))
 
     if parser.TABLE_NAME:
         ddcw.replace_name(parser.TABLE_NAME)
@@ -236,16 +295,56 @@ if __name__ == '__main__':
     if parser.SCHEMA_NAME:
         ddcw.replace_schema(parser.SCHEMA_NAME)
 
-    if parser.DDL:
+    if parser.COLUMNS:
+        if parser.DEMUX:
+            sys.stderr.write(f"\n--columns not support --demux\n\n")
+            sys.exit(1)
+        ddcw.COLUMNS = [x.strip().strip('`') for x in parser.COLUMNS.split(',') if x.strip()]
+        try:
+            ddcw._init_sql_prefix()
+        except ValueError as e:
+            sys.stderr.write(f"\n{e}\n\n")
+            sys.exit(1)
+
+    if parser.WHERE:
+        if parser.DEMUX:
+            sys.stderr.write(f"\n--where not support --demux\n\n")
+            sys.exit(1)
+        ddcw.WHERE1 = parser.WHERE
+        try:
+            ddcw._where()
+        except ValueError as e:
+            sys.stderr.write(f"\n{e}\n\n")
+            sys.exit(1)
+
+    ddcw.STRING_CACHE = parser.STRING_CACHE if parser.STRING_CACHE > 0 else 0
+
+    if parser.TIME_ZONE:
+        try:
+            parse_time_zone(parser.TIME_ZONE)
+        except ValueError as e:
+            sys.stderr.write(f"\n{e}\n\n")
+            sys.exit(1)
+        ddcw.TIME_ZONE = parser.TIME_ZONE
+
+    if parser.DDL and not parser.DEMUX:
         print(ddcw.get_ddl())
 
     ddcw.MULTIVALUE = True if parser.MULTI_VALUE and not parser.REPLACE else False
     ddcw.REPLACE = True if parser.REPLACE else False
     ddcw.LIMIT = parser.LIMIT if parser.LIMIT else -1
-    if parser.SQL and ddcw.table.row_format in ['DYNAMIC', 'COMPACT']:
+    if parser.DEMUX:
+        if ddcw.MYSQL5 or ddcw.IS_PARTITION:
+            sys.stderr.write(f"\n--demux need SDI, not support --mysql5/--sdi-table\n\n")
+            sys.exit(1)
+        for name, fname in ddcw.demux(parser.DEMUX, parser.DDL, parser.SQL).items():
+            sys.stderr.write(f"{name} --> {fname}\n")
+    elif parser.SQL and ddcw.table.row_format in ['DYNAMIC', 'COMPACT']:
         ddcw.get_sql()
     elif not ddcw.table.row_format in ['DYNAMIC', 'COMPACT']:
         sys.stderr.write(f"\nNot support row format. {ddcw.table.row_format}\n\n")
+    if parser.STATS:
+        ddcw.print_stats()
 
     # 记得关闭相关FD
     ddcw.close()
@@ -9,6 +9,8 @@ import struct
 import sys
 import os
 from ibd2sql.blob import first_blob
+from ibd2sql.page_source import open_page_source
+from ibd2sql.innodb_page_spaceORxdes import read_page_size
 
 def create_crc32c_table():
     poly = 0x82f63b78
@@ -45,12 +47,14 @@ if not os.path.exists(filename):
 	print(filename,'不存在啊!')
 	sys.exit(1)
 
+PAGE_SIZE = read_page_size(filename) # 和innodb_page_size一样, 从FSP_SPACE_FLAGS读
 f = open(filename,'rb')
-f.seek(4*16384,0)
-data = f.read(16384)
+f.seek(4*PAGE_SIZE,0)
+data = f.read(PAGE_SIZE)
 offset = 99 + struct.unpack('>h',data[97:99])[0] + 13 + 10
 pageid = struct.unpack('>L',data[offset:offset+4])[0] # LCTN所在的first_lob页
-aa = first_blob(f,pageid)
+with open_page_source(filename,PAGE_SIZE) as pf:
+	aa = first_blob(pf,pageid)
 aadict = dict([ x.split('=') for x in aa[:aa.find(b'\\')].decode().split(';')])
 
 if len(argv) == 4: # 修改, 暂时不支持
@@ -70,14 +74,14 @@ if len(argv) == 4: # 修改, 暂时不支持
 			if data == b'':
 				break
 			current_pageid += 1
-			data = f.read(16384)
+			data = f.read(PAGE_SIZE)
 			if current_pageid == pageid: # 只考虑LCTN在first_blob情况下的修改(因为懒...)
 				_offset = data.find(KEY)
 				data = data[:_offset+5] + str(newvalue).encode() + data[_offset+6:]
 				c1 = calculate_crc32c(data[4:26])
-				c2 = calculate_crc32c(data[38:16384-8])
+				c2 = calculate_crc32c(data[38:PAGE_SIZE-8])
 				cb = struct.pack('>L',(c1^c2)&(2**32-1))
-				data = cb + data[4:16384-8] + cb + data[16384-4:]
+				data = cb + data[4:PAGE_SIZE-8] + cb + data[PAGE_SIZE-4:]
 			f2.write(data)
 	print(f'set lower_case_table_names={newvalue} into new file({newfilename}) finish.')
 
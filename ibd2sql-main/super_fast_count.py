@@ -7,25 +7,24 @@ import os
 import sys
 import struct
 import time
-
-# 一些变量的初始化
-PAGE_SIZE = 16384
-
-# 后面内容就不可以修改了哈
-FSP_EXTENT_SIZE = 1048576//PAGE_SIZE if PAGE_SIZE <= 16384 else 2097152//PAGE_SIZE if PAGE_SIZE <= 32768 else 4194304//PAGE_SIZE
-XDES_COUNT = PAGE_SIZE//FSP_EXTENT_SIZE
-XDES_SIZE = 24 + (FSP_EXTENT_SIZE*2+7)//8
+from ibd2sql.page_source import open_page_source,throttle_source
+from ibd2sql.innodb_page_spaceORxdes import read_page_size,xdes_layout
 
 argv = sys.argv
 def USAGE():
-	sys.stdout.write('\nUSAGE: python super_fast_count.py xxx.ibd\n')
+	sys.stdout.write('\nUSAGE: python super_fast_count.py xxx.ibd [MAX_MBPS [MAX_IOPS]]\n')
 	sys.exit(1)
 
 
 
 
 
-if len(argv) != 2:
+if len(argv) < 2 or len(argv) > 4:
+	USAGE()
+try:
+	MAX_MBPS = float(argv[2]) if len(argv) > 2 else 0 # 限速, 0:不限制
+	MAX_IOPS = float(argv[3]) if len(argv) > 3 else 0
+except ValueError:
 	USAGE()
 
 filename = sys.argv[1]
@@ -33,18 +32,23 @@ if not os.path.exists(filename):
 	sys.stdout.write(str(filename)+" is not exists\n")
 	USAGE()
 
+# 页大小从FSP_SPACE_FLAGS读 (4K/8K/16K/32K/64K)
+PAGE_SIZE = read_page_size(filename)
+XDES_COUNT,XDES_SIZE = xdes_layout(PAGE_SIZE)
+
 MAX_PAGE_ID = os.path.getsize(filename)//PAGE_SIZE
 starttime = time.time()
-with open(filename,'rb') as f:
+with open_page_source(filename,PAGE_SIZE) as f: # mmap, 每页不用再seek+read了
+	if MAX_MBPS > 0 or MAX_IOPS > 0:
+		f = throttle_source(f,MAX_MBPS,MAX_IOPS)
 	# 获取first leaf pageid, 本来可以使用ibd2sql去做的, 但为了兼容性, 就单独来做吧..
-	fsp_data = f.read(PAGE_SIZE) # FSP, 要判断是否是8.x, 主要是有个SDI信息占了2 sgement
-	f.seek(2*PAGE_SIZE)
+	fsp_data = f.read(0) # FSP, 要判断是否是8.x, 主要是有个SDI信息占了2 sgement
 	# fil_hedaer + space_header + XDES + keyring(+4)
 	offset = 38 + 112 + XDES_COUNT*XDES_SIZE + 115
 	HAVE_SDI = 0
 	if fsp_data[offset:offset+4] == b'\x00\x00\x00\x01':
 		HAVE_SDI = 1
-	data = f.read(PAGE_SIZE)  # inode
+	data = f.read(2)  # inode
 	if data[24:26] != b'\x00\x03':
 		sys.stdout.write(str(filename)+" is not ibd file\n")
 		USAGE()
@@ -62,11 +66,10 @@ with open(filename,'rb') as f:
 	while True:
 		if PAGE_ID == 4294967295 or PAGE_ID > MAX_PAGE_ID:
 			break
-		f.seek(PAGE_ID*PAGE_SIZE)
 		#OLD_NEXT_PAGE_NO = PAGE_ID
-		data = f.read(PAGE_SIZE)
-		PAGE_ID = struct.unpack('>4LQHQ',data[:34])[3] # FIL_PAGE_NEXT
-		ROW_COUNT += struct.unpack('>9HQHQ',data[38:][:36])[-4] # PAGE_N_RECS
+		data = f.read(PAGE_ID)
+		PAGE_ID = struct.unpack_from('>L',data,12)[0] # FIL_PAGE_NEXT
+		ROW_COUNT += struct.unpack_from('>H',data,54)[0] # PAGE_N_RECS
 	stoptime = time.time()
 	filesize = str(round(MAX_PAGE_ID*PAGE_SIZE/1024/1024/1024,2))+' GB'
 	costtime = str(round(stoptime-starttime,2))+' seconds'
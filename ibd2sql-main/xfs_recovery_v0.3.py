@@ -5,6 +5,7 @@
 # 如果仅是测试的话, 可能得先刷盘, 不然磁盘可能没得你新建的表(实际环境使用请忽略). partprobe /dev/sdb
 # python3 xfs_recovery.py /dev/sdb # 扫描被drop的表
 # python3 xfs_recovery.py /dev/sdb inodeno /tmp/newfilename # 恢复被drop的表
+# python3 xfs_recovery.py /dev/sdb inodeno --sql # 不恢复文件, 直接解析被drop的表输出DDL和SQL (--ddl只要DDL)
 # xfs文件系统里面到处都是magic
 # 参考: 
 #      https://cdn.kernel.org/pub/linux/utils/fs/xfs/docs/xfs_filesystem_structure.pdf
@@ -14,6 +15,7 @@
 # v0.1 理论实现
 # v0.2 startblock是agno+blockid(in ag)
 # v0.3 扫描目录 (默认深度为1)
+# v0.4 不用先恢复成文件, 直接在块设备上解析被drop的表 (xfs_page_source)
 
 import struct
 import sys,os
@@ -456,53 +458,51 @@ class XFS(object):
 				pass #占茅坑不拉屎的
 				print('inode:',inode.di_ino)
 
-	def read_from_bmbt(self,ptrs,level):
-		if level == 2: # multiple level
-			pass # 目前没遇到, 虽然和下面一样,只不过多递归一次
-
-		elif level == 1: # single level tree 
-			nptrs = []
-			for offset,blockno in ptrs:
-				data = self.read(blockno)
-				mgaic = data[:4]
-				bb_level,bb_numrecs = struct.unpack('>HH',data[4:8])
-				leftsib,rightsib = struct.unpack('>QQ',data[8:24])
-				bno,lsn = struct.unpack('>QQ',data[24:40])
-				uuid = data[40:56].hex()
-				owner,crc32 = struct.unpack('>QL',data[56:68])
-				tdata = DATA_BUFFER(data)
-				tdata.offset = 72
-				for i in range(bb_numrecs):
-					ebtr = tdata.read_int(16)
-					ebtr = bin(ebtr)[2:].zfill(128)
-					extentflag = int(ebtr[:1],2)
-					startoff = int(ebtr[1:55],2)
-					startblock = int(ebtr[55:107],2)
-					blockcount = int(ebtr[107:128],2)
-					ebtr = int(ebtr,2)
-					nptrs.append([startoff,startblock,blockcount,extentflag,ebtr])
-				#print(len(nptrs))
-				#self.read_from_bmbt(nptrs,bb_level)
-				#return nptrs
-			for p in self.read_from_extent(nptrs):
-				yield p
-
-		elif level == 0: # 读数据咯 (还是使用yield)
-			#print('读书',ptrs)
-			#return self.read_from_extent(ptrs)
-			#for x in self.read_from_extent(ptrs):
-			#	print(1)
-			#	yield x
-			pass
+	def fsblock(self,startblock):
+		"""startblock是(AGNO,BLOCKNO), 转为设备上的块号"""
+		agno = startblock>>self.sb.agblklog
+		block_id = startblock&(2**self.sb.agblklog-1)
+		return agno*self.sb.agblocks+block_id
+
+	def bmbt_extent(self,ptrs,level):
+		"""遍历BMBT, 返回所有的extent: [[startoff,startblock,blockcount,extentflag,ebtr],]"""
+		nptrs = []
+		for offset,blockno in ptrs:
+			data = self.read(self.fsblock(blockno))
+			mgaic = data[:4]
+			bb_level,bb_numrecs = struct.unpack('>HH',data[4:8])
+			leftsib,rightsib = struct.unpack('>QQ',data[8:24])
+			bno,lsn = struct.unpack('>QQ',data[24:40])
+			uuid = data[40:56].hex()
+			owner,crc32 = struct.unpack('>QL',data[56:68])
+			if bb_level > 0: # node, 后面是keys和ptrs, ptrs从块的一半开始: 72 + maxrecs*8
+				maxrecs = (len(data)-72)//16
+				keys = struct.unpack(f'>{bb_numrecs}Q',data[72:72+bb_numrecs*8])
+				_ptrs = struct.unpack(f'>{bb_numrecs}Q',data[72+maxrecs*8:72+maxrecs*8+bb_numrecs*8])
+				nptrs += self.bmbt_extent(list(zip(keys,_ptrs)),bb_level)
+				continue
+			tdata = DATA_BUFFER(data)
+			tdata.offset = 72
+			for i in range(bb_numrecs):
+				ebtr = tdata.read_int(16)
+				ebtr = bin(ebtr)[2:].zfill(128)
+				extentflag = int(ebtr[:1],2)
+				startoff = int(ebtr[1:55],2)
+				startblock = int(ebtr[55:107],2)
+				blockcount = int(ebtr[107:128],2)
+				ebtr = int(ebtr,2)
+				nptrs.append([startoff,startblock,blockcount,extentflag,ebtr])
+		return nptrs
 
+	def read_from_bmbt(self,ptrs,level):
+		for p in self.read_from_extent(self.bmbt_extent(ptrs,level)):
+			yield p
 
 	def read_from_extent(self,extent):
 		for startoff,startblock,blockcount,extentflag,ebtr in extent:
 			for i in range(blockcount):
 				#print('READ BLOCK ID',startblock+i)
-				agno = startblock>>self.sb.agblklog
-				block_id = startblock&(2**self.sb.agblklog-1)
-				offset = agno*self.sb.agblocks+block_id+i
+				offset = self.fsblock(startblock)+i
 				try:
 					yield self.read(offset) 
 				except Exception as e:
@@ -563,6 +563,25 @@ class XFS(object):
 			for x in reader:
 				f.write(x)
 
+	def parse(self,inodeno,ddl=True,sql=True):
+		"""不恢复文件, 直接在块设备上解析被drop的表"""
+		agno,blockid,blockoffset,offset = self.sb.de_inode(inodeno)
+		self.f.seek(offset)
+		inode = INODE(self.f.read(512))
+		if inode.di_format not in (2,3):
+			print('UNKNOWN INODE',inode)
+			return
+		from ibd2sql.ibd2sql import ibd2sql
+		ddcw = ibd2sql()
+		ddcw.FILENAME = f'{self.filename}:{inodeno}'
+		ddcw.PAGE_SOURCE = xfs_page_source(self,inode)
+		ddcw.init()
+		if ddl:
+			print(ddcw.get_ddl())
+		if sql:
+			ddcw.get_sql()
+		ddcw.close()
+
 	def scan(self,):
 		""" 扫描磁盘找被删除的ibd文件, 并打印相关信息"""
 		""" 无法直接扫描inode,因为inode号不是连续的,毕竟可以通过inodeno计算inode位置了"""
@@ -723,6 +742,91 @@ class XFS(object):
 						current_offset += 9+_namelen+1
 					
 	
+class xfs_page_source(object):
+	"""
+	ibd2sql的page source: 按inode的extent(或者BMBT)把页号映射到块设备上的块, 直接读, 不用先把文件复制出来
+	空洞和unwritten extent(预分配的)读出来是0
+	input: xfs:   XFS对象
+	       inode: 被drop的表的INODE
+	       pagesize: 0表示从第一页(FSP_HDR)的FSP_SPACE_FLAGS获取
+	"""
+	def __init__(self,xfs,inode,pagesize=0):
+		self.filename = xfs.filename
+		self.name = 'xfs'
+		self.blocksize = 4096 # 和XFS.read一样
+		self.fd = os.open(xfs.filename,os.O_RDONLY)
+		extent = inode.extent if inode.di_format == 2 else xfs.bmbt_extent(inode.ptrs,inode.level)
+		self.extent = sorted([ (x[0],xfs.fsblock(x[1]),x[2],x[3]) for x in extent ]) # startoff,设备上的块号,blockcount,extentflag
+		self.startoff = [ x[0] for x in self.extent ]
+		self.nblocks = max([ x[0]+x[2] for x in self.extent ]) if self.extent else 0
+		self.bytes_read = 0
+		self.PAGESIZE = 16384
+		if pagesize <= 0:
+			from ibd2sql.innodb_page_spaceORxdes import fsp_page_size
+			data = self._read(0,38+24)
+			pagesize = fsp_page_size(struct.unpack('>L',data[38+16:38+20])[0]) or 16384
+		self.PAGESIZE = pagesize
+
+	def _read(self,offset,size):
+		"""读文件里 [offset,offset+size) 的数据, 跨extent的话分多次读"""
+		import bisect
+		rdata = b''
+		while size > 0:
+			fblock = offset//self.blocksize
+			boffset = offset%self.blocksize
+			i = bisect.bisect_right(self.startoff,fblock) - 1
+			if i >= 0 and fblock < self.extent[i][0] + self.extent[i][2]:
+				startoff,startblock,blockcount,extentflag = self.extent[i]
+				n = min(size,(startoff+blockcount-fblock)*self.blocksize-boffset)
+				if extentflag: # unwritten extent
+					data = b'\x00'*n
+				else:
+					data = os.pread(self.fd,n,(startblock+fblock-startoff)*self.blocksize+boffset)
+					self.bytes_read += len(data)
+					if len(data) < n:
+						data += b'\x00'*(n-len(data))
+			else: # 空洞, 一直到下一个extent
+				nextoff = self.startoff[i+1] if i+1 < len(self.startoff) else self.nblocks
+				if fblock >= self.nblocks:
+					break
+				n = min(size,(nextoff-fblock)*self.blocksize-boffset)
+				data = b'\x00'*n
+			rdata += data
+			offset += n
+			size -= n
+		return rdata
+
+	def read(self,pageno):
+		return self._read(pageno*self.PAGESIZE,self.PAGESIZE)
+
+	def pread(self,pageno):
+		return self.read(pageno)
+
+	def read_extent(self,pageno,n):
+		return self._read(pageno*self.PAGESIZE,n*self.PAGESIZE)
+
+	def size(self):
+		return self.nblocks*self.blocksize
+
+	def page_count(self):
+		return self.size()//self.PAGESIZE
+
+	def stats(self):
+		return {'page_source':self.name,'bytes_read':self.bytes_read}
+
+	def close(self):
+		try:
+			os.close(self.fd)
+		except:
+			pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+
 def test():
 	with open('/dev/sdb','rb') as f:
 		data = f.read(4096)
@@ -747,7 +851,7 @@ def test():
 
 argv = sys.argv
 if len(argv) == 1 or len(argv) > 4: #or len(argv) == 3:
-	print('USAGE: python3 ',argv[0],' devicename [inode] [filename]')
+	print('USAGE: python3 ',argv[0],' devicename [inode] [filename|--sql|--ddl]')
 	sys.exit(1)
 else:
 	devicename = argv[1]
@@ -760,7 +864,7 @@ if len(argv) >= 3 and len(argv) <= 4 or len(argv) == 2:
 		inodeno = int(argv[2])
 	if len(argv) > 3:
 		filename = argv[3]
-	if len(argv) == 4 and os.path.exists(filename):
+	if len(argv) == 4 and filename not in ('--sql','--ddl') and os.path.exists(filename):
 		print(filename,' 文件存在, 请换个名字')
 		sys.exit(2)
 	SCANDIR = False
@@ -795,5 +899,7 @@ if len(argv) >= 3 and len(argv) <= 4 or len(argv) == 2:
 				ddcw.scan()
 		elif len(argv) == 3: # indoe查看
 			ddcw.view_inode_info(inodeno)
+		elif filename in ('--sql','--ddl'): # 直接解析, 不恢复文件
+			ddcw.parse(inodeno,ddl=True,sql=filename == '--sql')
 		else: # 文件恢复
 			ddcw.recovery(inodeno,filename)